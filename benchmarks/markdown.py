@@ -0,0 +1,80 @@
+"""
+Markdown engines benchmark: renders synthetic corpus with every installed
+engine, reports time per document and checks if output matches output
+of the default engine.
+
+Usage:
+
+    python benchmarks/markdown.py [--docs 500] [--repeat 3]
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import argparse
+import re
+import time
+import docta.markdown
+
+DOC_TEMPLATE = '''
+Section %(n)s
+==========
+
+Paragraph with *emphasis*, **strong text**, `inline code` and
+[a link](http://example.com/%(n)s). Line breaks are
+kept as is.
+
+* first item
+* second item with ~~strikethrough~~
+* third item
+
+1. one
+2. two
+
+> Quote for document %(n)s
+
+```python
+def func_%(n)s(x):
+    return x * %(n)s
+```
+
+Name | Value
+---- | -----
+n    | %(n)s
+'''
+
+
+def make_corpus(docs):
+    return [DOC_TEMPLATE % {'n': n} for n in range(docs)]
+
+
+def normalize(html):
+    return re.sub(r'\s+', ' ', html).strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--docs', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.docs)
+    reference = None
+    print("%-10s %12s %12s %10s" % ('engine', 'best, ms', 'us/doc', 'matches'))
+    for name in [docta.markdown.ENGINE_DEFAULT] + [
+            n for n in docta.markdown.available_engines()
+            if n != docta.markdown.ENGINE_DEFAULT]:
+        engine = docta.markdown.get_engine(name)
+        best = None
+        for _ in range(args.repeat):
+            t0 = time.time()
+            output = [engine.html(text) for text in corpus]
+            spent = time.time() - t0
+            best = spent if best is None else min(best, spent)
+        output = [normalize(html) for html in output]
+        if reference is None:
+            reference = output
+        matches = sum(1 for a, b in zip(reference, output) if a == b)
+        print("%-10s %12.2f %12.2f %9d%%" % (name, 1000.0 * best, 1e6 * best / len(corpus),
+                                             100 * matches // len(corpus)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Memory benchmark for chapters tree: builds synthetic tree in memory
+with 100k chapters like loader does and reports memory allocated
+for the tree with `tracemalloc`.
+
+Usage:
+
+    python benchmarks/memory.py [--chapters 100000] [--per-dir 100]
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import argparse
+import gc
+import time
+import tracemalloc
+import docta.chapters as chapters
+import docta.utils.config
+import docta.utils.meta as meta
+
+
+def make_tree(count, per_dir):
+    """
+    Build tree of `count` chapters, `per_dir` pages in every index chapter.
+    """
+    config = docta.utils.config.ConfigView({'server': {'base_url': '/'}},
+                                           {'index': 'index.md'})
+    root = chapters.TextChapter(config, title='Home', nav_path='', is_index=True)
+    root.file_path = '/docs/index.md'
+    sections, made = [], 1
+    while made < count:
+        n = len(sections)
+        section = chapters.TextChapter(config, title='Section %s' % n,
+                                       nav_path='section%s' % n, is_index=True)
+        section.file_path = '/docs/section%s/index.md' % n
+        section.meta = meta.Meta(title=section.title)
+        pages = []
+        for i in range(min(per_dir, count - made - 1)):
+            page = chapters.TextChapter(config, title='Page %s' % i,
+                                        nav_path='section%s/page%s' % (n, i))
+            page.file_path = '/docs/section%s/page%s.md' % (n, i)
+            page.meta = meta.Meta(title=page.title)
+            page.level = 2
+            pages.append(page)
+        section.level = 1
+        section.add_children(pages)
+        sections.append(section)
+        made += len(pages) + 1
+    root.add_children(sections)
+    return root, made
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--chapters', type=int, default=100000)
+    parser.add_argument('--per-dir', type=int, default=100)
+    args = parser.parse_args()
+
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.time()
+    root, made = make_tree(args.chapters, args.per_dir)
+    t1 = time.time()
+    gc.collect()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("chapters:    %d" % made)
+    print("build time:  %.2fms" % (1000.0 * (t1 - t0)))
+    print("memory:      %.2f MB (peak %.2f MB)" % (size / 1048576.0, peak / 1048576.0))
+    print("per chapter: %.0f bytes" % (float(size) / made))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Scan-only benchmark for chapters tree loader: compares `os.listdir()` +
+`isdir()`/`isfile()` scanning with `docta.utils.fs.scan()` on synthetic
+tree and reports entries per second.
+
+Usage:
+
+    python benchmarks/scan.py [--files 100000] [--per-dir 1000] [--path DIR]
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import docta.utils.fs as fs
+
+
+def make_tree(path, files, per_dir):
+    """
+    Create synthetic tree with `files` Markdown files, `per_dir` files
+    in every sub-directory.
+    """
+    for n in range(files):
+        dir_path = fs.join(path, 'dir%05d' % (n // per_dir))
+        if n % per_dir == 0:
+            fs.mkdirs(dir_path)
+            name = 'index.md'
+        else:
+            name = 'page%05d.md' % n
+        with open(fs.join(dir_path, name), 'w') as out_file:
+            out_file.write('---\ntitle: Page %s\n---\nText\n' % n)
+
+
+def scan_listdir(path):
+    count = 0
+    for name in os.listdir(path):
+        full_path = fs.join(path, name)
+        if fs.isdir(full_path):
+            count += scan_listdir(full_path)
+        elif fs.isfile(full_path):
+            count += 1
+    return count
+
+
+def scan_fs(path):
+    files, dirs = fs.scan(path)
+    count = len(files)
+    for name in dirs:
+        count += scan_fs(fs.join(path, name))
+    return count
+
+
+def measure(title, func, path):
+    t0 = time.time()
+    count = func(path)
+    t1 = time.time()
+    print("%-12s %8d entries %10.2fms %12.0f entries/s" %
+          (title, count, 1000.0 * (t1 - t0), count / max(t1 - t0, 1e-9)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--files', type=int, default=100000)
+    parser.add_argument('--per-dir', type=int, default=1000)
+    parser.add_argument('--path', help="existing tree to scan")
+    args = parser.parse_args()
+
+    path = args.path
+    if not path:
+        path = tempfile.mkdtemp(prefix='docta-bench-')
+        print("Creating %s files tree at %s" % (args.files, path))
+        make_tree(path, args.files, args.per_dir)
+    try:
+        measure('listdir', scan_listdir, path)
+        measure('fs.scan', scan_fs, path)
+    finally:
+        if not args.path:
+            shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Dev server load benchmark: serves synthetic site from temporary directory
+and requests pages and assets from several concurrent keep-alive clients.
+Reports requests per second for plain and conditional (304) requests.
+
+Usage:
+
+    python benchmarks/server.py [--clients 8] [--requests 500] [--pages 100]
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+import docta.utils.server as server
+
+# Python 3.x
+try:
+    import http.client as httplib
+# Python 2.x
+except ImportError:
+    import httplib
+
+ASSET_SIZE = 4 * 1024 * 1024
+
+
+class QuietHandler(server.RequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def make_site(path, pages):
+    """
+    Write synthetic pages and one large asset.
+    """
+    for n in range(pages):
+        with open(os.path.join(path, 'page%s.html' % n), 'wb') as out_file:
+            out_file.write(('<html><body>%s</body></html>' % ('Page %s. ' % n * 500)).encode('UTF-8'))
+    with open(os.path.join(path, 'asset.bin'), 'wb') as out_file:
+        out_file.write(os.urandom(ASSET_SIZE))
+
+
+def client(port, urls, conditional, results):
+    """
+    Request URLs over single keep-alive connection.
+    """
+    conn = httplib.HTTPConnection('127.0.0.1', port)
+    etags, count = {}, 0
+    for url in urls:
+        headers = {}
+        if conditional and url in etags:
+            headers['If-None-Match'] = etags[url]
+        conn.request('GET', url, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        etags[url] = response.getheader('ETag')
+        count += 1
+    conn.close()
+    results.append(count)
+
+
+def bench(port, clients, requests, pages, conditional):
+    urls = ['/page%s.html' % (n % pages) for n in range(requests)]
+    urls[::50] = ['/asset.bin'] * len(urls[::50])
+    results = []
+    threads = [threading.Thread(target=client, args=(port, urls, conditional, results))
+               for _ in range(clients)]
+    t0 = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(results) / (time.time() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--pages', type=int, default=100)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        make_site(path, args.pages)
+        httpd = server.make_server(path, port=0, handler=QuietHandler)
+        thread = threading.Thread(target=httpd.serve_forever)
+        thread.daemon = True
+        thread.start()
+        port = httpd.server_address[1]
+
+        print("Clients: %s, requests per client: %s" % (args.clients, args.requests))
+        for conditional in (False, True):
+            rps = bench(port, args.clients, args.requests, args.pages, conditional)
+            print("%-12s %10.1f req/s" % ('conditional' if conditional else 'plain', rps))
+
+        httpd.shutdown()
+        httpd.server_close()
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Tree construction benchmark: loads directories with growing number of
+pages and compares bulk children adding with per-insert `add_child()`.
+Time per page should stay flat for linear scaling.
+
+Usage:
+
+    python benchmarks/tree.py [--sizes 1000,2000,4000,8000,16000]
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import argparse
+import shutil
+import tempfile
+import time
+import docta.chapters as chapters
+import docta.utils.fs as fs
+
+
+def make_dir(path, size):
+    """
+    Create directory with index and `size - 1` pages.
+    """
+    fs.mkdirs(path)
+    for n in range(size):
+        name = n and ('page%06d.md' % n) or 'index.md'
+        with open(fs.join(path, name), 'w') as out_file:
+            out_file.write('---\ntitle: Page %s\n---\nText\n' % (size - n))
+
+
+def load_bulk(path):
+    return chapters.load_tree(path, {})
+
+
+def load_per_insert(path):
+    root = chapters.load_tree(path, {})
+    children, root.children = root.children, []
+    for child in children:
+        root.add_child(child)
+    return root
+
+
+def measure(func, path):
+    t0 = time.time()
+    func(path)
+    return time.time() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', default='1000,2000,4000,8000,16000')
+    args = parser.parse_args()
+
+    base_path = tempfile.mkdtemp(prefix='docta-bench-')
+    print("%8s %12s %12s %16s" % ('pages', 'bulk, ms', 'us/page', 'add_child, ms'))
+    try:
+        for size in [int(x) for x in args.sizes.split(',')]:
+            path = fs.join(base_path, str(size))
+            make_dir(path, size)
+            bulk = measure(load_bulk, path)
+            per_insert = measure(load_per_insert, path) - measure(load_bulk, path)
+            print("%8d %12.2f %12.2f %16.2f" %
+                  (size, 1000.0 * bulk, 1e6 * bulk / size, 1000.0 * per_insert))
+    finally:
+        shutil.rmtree(base_path)
+
+
+if __name__ == '__main__':
+    main()
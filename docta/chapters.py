@@ -3,69 +3,106 @@ Chapters handling. Every document page or directory
 is represented by Chapter.
 """
 from __future__ import absolute_import, print_function, unicode_literals
-import os
+import sys
+import docta.markdown
 import docta.utils.fs as fs
+import docta.utils.manifest as manifest
 import docta.utils.meta as meta
-import docta.utils.md2 as md
 
+# Python 3.x
+try:
+    intern = sys.intern
+# Python 2.x, unicode strings can't be interned
+except AttributeError:
+    intern = lambda s: s
 
-def load_tree(path, config, nav_path=''):
+
+def load_tree(path, config, nav_path='', snapshot=None):
     """
     Load chapters tree. Only Markdown text based chapters
-    handled at the moment.
+    handled at the moment. Unchanged dirs and files data is taken
+    from `snapshot` if provided.
     """
-    return TextChapter.load_tree(path, config, nav_path=nav_path)
+    return TextChapter.load_tree(path, config, nav_path=nav_path,
+                                 snapshot=snapshot)
 
 
-class BaseChapter():
+class BaseChapter(object):
     """
     Base data container, chapters are organized hierarchically.
+
+    Chapters are slotted to keep large trees compact: config is shared
+    between all chapters of the root, leaf chapters share empty children
+    tuple and nav path segments are interned.
     """
+    __slots__ = ('config', 'file_path', 'body_offset',
+                 'content_raw', 'content_html', 'title', 'sorting', 'icon', 'meta',
+                 'parent', 'level', 'depth', 'children',
+                 'nav_path', 'is_index', 'rel_dir_path')
+
     def __init__(self, config, title, nav_path, is_index=False):
         # config
         self.config = config
         self.file_path = None
+        self.body_offset = 0
         # data
         self.content_raw = None
         self.content_html = None
         self.title = title
+        self.sorting = title
+        self.icon = None
         self.meta = {}
         # structure
         self.parent = None
         self.level = 0
         self.depth = 0
-        self.children = []
+        self.children = ()
         # navigation
-        self.nav_path = nav_path
+        self.nav_path = intern(nav_path)
         self.is_index = is_index
-        self.rel_dir_path = nav_path.replace('/', fs.sep) if is_index else None
+        if is_index:
+            self.rel_dir_path = self.nav_path if fs.sep == '/' else nav_path.replace('/', fs.sep)
+        else:
+            self.rel_dir_path = None
 
     def __str__(self):
         return '%s (%s)' % (self.title, self.nav_path)
 
     def __eq__(self, other):
-        if other:
+        if self is other:
+            return True
+        elif other:
             return self.nav_path == other.nav_path
         else:
             return False
 
+    def __hash__(self):
+        return hash(self.nav_path)
+
     def __ne__(self, other):
         return not self.__eq__(other)
 
-    def load_meta(self, file_path):
+    @property
+    def file_name(self):
+        return self.file_path and fs.basename(self.file_path)
+
+    def load_meta(self, file_path, snapshot=None):
         """
         Load meta and update base chapter info.
         """
-        self.meta = self.extract_meta(file_path)
+        if snapshot:
+            self.meta, self.body_offset = snapshot.meta(file_path, self.extract_meta)
+        else:
+            self.meta, self.body_offset = self.extract_meta(file_path)
         self.file_path = file_path
-        self.file_name = fs.basename(file_path)
         self.title = self.meta.get('title', self.title)
         self.sorting = self.meta.get('sorting', self.title)
         self.icon = self.meta.get('icon', None)
 
-    def load_content(self):
+    def load_content(self, cache=None):
         """
         Load content. Meta have to be loaded before loading content!
+        Rendered content may be taken from `cache`.
         """
         raise Exception(NotImplemented)
 
@@ -86,10 +123,29 @@ class BaseChapter():
         if not child.is_index:
             child.rel_dir_path = self.rel_dir_path
 
+        self.children = list(self.children)
         self.children.append(child)
         self.children.sort(key=lambda x: x.sorting)
         self.update_depth()
 
+    def add_children(self, children):
+        """
+        Add child chapters in bulk: children are sorted once and depth is
+        calculated by children depths, so children subtrees are expected
+        to be loaded already.
+        """
+        level = self.level + 1
+        for child in children:
+            child.parent = self
+            child.level = level
+            if not child.is_index:
+                child.rel_dir_path = self.rel_dir_path
+        if children:
+            self.children = list(self.children)
+            self.children.extend(children)
+            self.children.sort(key=lambda x: x.sorting)
+            self.update_depth()
+
     def update_depth(self):
         """
         Update tree depth.
@@ -102,12 +158,12 @@ class BaseChapter():
     @classmethod
     def extract_meta(cls, file_path):
         """
-        Extract meta from file.
+        Extract meta from file, returns `(meta, body_offset)`.
         """
         raise Exception(NotImplemented)
 
     @classmethod
-    def load_tree(cls, path, config, nav_path='', parent=None):
+    def load_tree(cls, path, config, nav_path='', parent=None, snapshot=None):
         """
         Load chapters tree.
         """
@@ -150,94 +206,132 @@ class TextChapter(BaseChapter):
     """
     Chapter for text documents formatted with YAML + Markdown.
     """
+    __slots__ = ()
+
     INDEX_FILE = 'index.md'
 
-    def load_content(self):
+    def load_content(self, cache=None):
         """
         Load content. Meta have to be loaded before loading content!
+        Rendered HTML is looked up in `cache` by content hash before
+        calling Markdown engine, see 'markdown' config key.
         """
         if self.file_path:
-            with fs.open(self.file_path, 'r') as in_file:
-                self.content_raw = meta.stripped(in_file)
+            md = docta.markdown.get_engine(self.config.get('markdown'))
+            self.content_raw = meta.load_body(self.file_path, self.body_offset)
+            if cache:
+                key = manifest.text_hash(md.ENGINE_ID, sorted(md.OPTIONS.items()),
+                                         self.content_raw)
+                self.content_html = cache.get(key)
+                if self.content_html is None:
+                    self.content_html = md.html(self.content_raw)
+                    cache.set(key, self.content_html)
+            else:
                 self.content_html = md.html(self.content_raw)
 
     @classmethod
     def extract_meta(cls, file_path):
         """
-        Extract meta from YAML file header.
+        Extract meta from YAML file header, returns `(meta, body_offset)`.
+        File is read once, body offset is used later for loading content.
         """
-        with fs.open(file_path, 'r') as in_file:
-            return meta.extract(in_file)
-        return {}
+        return meta.load(file_path)
 
     @classmethod
-    def load_tree(cls, path, config, nav_path='', parent=None):
+    def load_tree(cls, path, config, nav_path='', parent=None, snapshot=None):
         """
         Load chapters tree recursivelly.
         """
+        chapter, orphans = cls.load_dir(path, config, nav_path=nav_path,
+                                        parent=parent, snapshot=snapshot)
+        # add to parent
+        if parent:
+            parent.add_children(chapter and [chapter] or orphans)
+        return chapter
+
+    @classmethod
+    def load_dir(cls, path, config, nav_path='', parent=None, snapshot=None):
+        """
+        Load chapter for dir with its subtree, returns `(chapter, orphans)`.
+        If there's no index file in dir then chapter is None and orphans
+        are chapters found in sub-dirs. Result is not added to parent.
+        """
         index_name = config.get('index', cls.INDEX_FILE)
         files, dirs = [], []
         # print ("Load tree: %s, %s" % (path, config))
         
         # scan sub-dirs and files
-        for name in os.listdir(path):
-            full_path = fs.join(path, name)
-            # dirs
-            if fs.isdir(full_path):
-                if not cls.is_name_masked(name):
-                    dirs.append(full_path)
-            # files
-            elif fs.isfile(full_path):
-                if cls.is_file_to_render(name):
-                    files.append(name)
+        if snapshot:
+            file_names, dir_names = snapshot.scan(path)
+        else:
+            file_names, dir_names = fs.scan(path)
+        for name in dir_names:
+            if not cls.is_name_masked(name):
+                dirs.append(fs.join(path, name))
+        for name in file_names:
+            if cls.is_file_to_render(name):
+                files.append(name)
 
         # no index = no data here, but don't give up, try scan deeper!
         if not index_name in files:
-            cls.load_subdirs(dirs, config, nav_path=nav_path, parent=parent)
-            return
+            orphans = cls.load_subdirs(dirs, config, nav_path=nav_path,
+                                       parent=parent, snapshot=snapshot)
+            return None, orphans
 
         # index found = create chapter!
         initial_title = fs.basename(path).capitalize()
         chapter = cls(config, title=initial_title, nav_path=nav_path, is_index=True)
-        chapter.load_meta(file_path=fs.join(path, index_name))
+        chapter.load_meta(file_path=fs.join(path, index_name), snapshot=snapshot)
+        chapter.level = parent and (parent.level + 1) or 0
         files.remove(index_name)
 
-        # add to parent
-        if parent:
-            parent.add_child(chapter)
-
-        # load files
-        cls.load_files(path, files, config, nav_path=nav_path, parent=chapter)
-
-        # load dirs
-        cls.load_subdirs(dirs, config, nav_path=nav_path, parent=chapter)
+        # load files and dirs, then add children in bulk
+        children = cls.load_files(path, files, config, nav_path=nav_path,
+                                  parent=chapter, snapshot=snapshot)
+        children.extend(cls.load_subdirs(dirs, config, nav_path=nav_path,
+                                         parent=chapter, snapshot=snapshot))
+        chapter.add_children(children)
 
         # print ("chapter: %s, files: %s, dirs: %s" % (str(chapter), files, dirs))
-        return chapter
+        return chapter, []
 
     @classmethod
-    def load_files(cls, base_path, files, config, nav_path='', parent=None):
+    def load_files(cls, base_path, files, config, nav_path='', parent=None,
+                   snapshot=None):
         """
-        Helper for loading chapters from files.
+        Helper for loading chapters from files, returns list of chapters
+        which are not added to parent yet.
         """
+        children = []
+        level = parent and (parent.level + 1) or 0
         for name in files:
             file_path = fs.join(base_path, name)
-            file_slug = cls.slug_by_name(name)
+            file_slug = intern(cls.slug_by_name(name))
             file_nav_path = nav_path and '/'.join((nav_path, file_slug)) or file_slug
             child = cls(config, title=file_slug.capitalize(),
                         nav_path=file_nav_path, is_index=False)
-            child.load_meta(file_path)
-            parent.add_child(child)
+            child.load_meta(file_path, snapshot=snapshot)
+            child.level = level
+            children.append(child)
+        return children
 
     @classmethod
-    def load_subdirs(cls, dirs, config, nav_path='', parent=None):
+    def load_subdirs(cls, dirs, config, nav_path='', parent=None, snapshot=None):
         """
-        Helper for loading chapters from sub dirs.
+        Helper for loading chapters from sub dirs, returns list of chapters
+        which are not added to parent yet.
         """
+        children = []
         for dir_path in dirs:
-            dir_slug = fs.basename(dir_path)
+            dir_slug = intern(fs.basename(dir_path))
             dir_nav_path = nav_path and '/'.join((nav_path, dir_slug)) or dir_slug
-            cls.load_tree(dir_path, config, nav_path=dir_nav_path, parent=parent)
+            chapter, orphans = cls.load_dir(dir_path, config, nav_path=dir_nav_path,
+                                            parent=parent, snapshot=snapshot)
+            if chapter:
+                children.append(chapter)
+            else:
+                children.extend(orphans)
+        return children
 
     @classmethod
     def is_file_to_render(self, name):
@@ -10,6 +10,8 @@ import sys
 import time
 import yaml
 import docta.project
+import docta.utils.cache
+import docta.utils.pages
 import docta.utils.server
 import docta.utils.json as json
 import docta.utils.fs as fs
@@ -79,6 +81,19 @@ class CLI(object):
         # Command: build
         cmd_build = sub_parsers.add_parser('build',
             help="build project")
+        cmd_build.add_argument('-f', '--force',
+                               action='store_true',
+                               help="render all chapters, even unchanged ones")
+        cmd_build.add_argument('-j', '--jobs',
+                               type=int,
+                               help="number of rendering processes, 0 for CPUs count")
+
+        # Command: cache
+        cmd_cache = sub_parsers.add_parser('cache',
+            help="show cache stats or clear cache")
+        cmd_cache.add_argument('action',
+                               choices=['stats', 'clear'],
+                               help="cache action")
 
         # Command: serve
         cmd_serve = sub_parsers.add_parser('serve',
@@ -86,6 +101,9 @@ class CLI(object):
         cmd_serve.add_argument('-w', '--watch',
                                action='store_true',
                                help="watch for changes and rebuild")
+        cmd_serve.add_argument('-l', '--lazy',
+                               action='store_true',
+                               help="render pages on request, implies --watch")
 
         # Command: help
         cmd_help = sub_parsers.add_parser('help',
@@ -144,12 +162,33 @@ class CLI(object):
 
     def cmd_build(self):
         t0 = time.time()
-        self.current_project().build(['html'])
+        self.current_project().build(['html'], force=self.args.force,
+                                     jobs=self.args.jobs)
         t1 = time.time()
         log.success("Project build time: %.2fms" % (1000.0 * (t1 - t0)))
         log.message("Run '%(name)s serve' command for serving or '%(name)s serve --watch'." %
             {'name': self.script_name()})
 
+    def cmd_cache(self):
+        cache_dir = self.current_project().cache_dir()
+        if not cache_dir:
+            exit_with_error("Cache is disabled in '%s'." % self.args.config)
+
+        if self.args.action == 'clear':
+            self.current_project().clear_cache()
+            log.success("Cache cleared: %s" % cache_dir)
+            return
+
+        log.message("Cache directory: %s" % cache_dir)
+        for name, cache in sorted(self.current_project().disk_caches().items()):
+            stats = cache.stats()
+            log.message("  %-12s %8d files %10.2f MB of %.2f MB" %
+                        (name, stats['count'], stats['size'] / 1048576.0,
+                         stats['size_limit'] / 1048576.0))
+        for path in sorted(self.current_project().cache_entries()):
+            count, size = docta.utils.cache.dir_stats(path)
+            log.message("  %-12s %8d files %10.2f MB" % (fs.basename(path), count, size / 1048576.0))
+
     def cmd_config(self):
         print(yaml.safe_dump(self.current_config(), default_flow_style=False, allow_unicode=True))
         # print(json.dumps(self.current_config(), indent=4))
@@ -183,10 +222,19 @@ class CLI(object):
         log.message("Starting server at %s " % 
             datetime.datetime.now().strftime('%d %B %Y - %H:%M:%S'))
         
-        # Watch - doesn't lock thread without explicit .join()
-        if self.args.watch:
+        # Lazy mode - pages are rendered on request
+        pages = None
+        if self.args.lazy:
+            cache_size = config.get('page_cache', docta.utils.pages.PAGE_CACHE_SIZE)
+            pages = docta.utils.pages.PageCache(project, 'html', size=cache_size)
+
+        # Watch - doesn't lock thread without explicit .join(),
+        # browsers are notified about changes with server-sent events
+        events = None
+        if self.args.watch or self.args.lazy:
             import docta.utils.watcher as watcher
-            watcher.watch(project)
+            events = docta.utils.server.EventStream()
+            watcher.watch(project, pages=pages, events=events)
 
         # Prepare output dir
         output_dir = project.output_dir('html')
@@ -195,7 +243,9 @@ class CLI(object):
         # Server - runs and locks current thread
         docta.utils.server.run(output_dir,
                                host=config.get('host', None),
-                               port=config.get('port', None))
+                               port=config.get('port', None),
+                               pages=pages,
+                               events=events)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,48 @@
+{#-
+    Client-side sidebar navigation for `navigation: manifest` output mode.
+    Rendered once per build to assets dir, `data` is navigation tree:
+
+        {"icons": {name: html}, "tree": [[url, title, icon, is_index, children]]}
+-#}
+(function () {
+    var data = {{ data }};
+
+    function icon(node) {
+        return node[2] ? data.icons[node[2]] : '';
+    }
+
+    function item(node, active, extra) {
+        return '<li ' + (node[0] === active ? 'class="active"' : '') + '>' +
+               '<a href="' + node[0] + '"' + (extra || '') + '>' + icon(node) + node[1] + '</a>';
+    }
+
+    function render(active) {
+        var html = [];
+        data.tree.forEach(function (top) {
+            html.push('<div class="panel panel-default"><div class="panel-body">' +
+                      '<ul class="nav nav-pills nav-stacked nav-tree">');
+            html.push(item(top, active, ' class="index"') +
+                      (top[4].length ? '<hr>' : '') + '</li>');
+            top[4].forEach(function (ch1) {
+                var index = ch1[3] && ch1[4].length;
+                html.push(item(ch1, active, index ? ' class="index"' : ''));
+                if (ch1[4].length) {
+                    html.push('<ul class="nav nav-pills nav-stacked">');
+                    ch1[4].forEach(function (ch2) {
+                        html.push('<li ' + (ch2[0] === active ? 'class="active"' : '') + '>' +
+                                  '<a href="' + ch2[0] + '">' + ch2[1] + '</a></li>');
+                    });
+                    html.push('</ul>');
+                }
+                html.push('</li>');
+            });
+            html.push('</ul></div></div>');
+        });
+        return html.join('');
+    }
+
+    var nodes = document.querySelectorAll('.docta-navigation');
+    for (var i = 0; i < nodes.length; i++) {
+        nodes[i].innerHTML = render(nodes[i].getAttribute('data-active'));
+    }
+})();
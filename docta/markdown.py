@@ -0,0 +1,42 @@
+"""
+Markdown engines registry. Engine is selected by 'markdown' config key,
+Mistune is used by default. Engine is a module providing:
+
+    html(text)  -- render Markdown text to HTML
+    ENGINE_ID   -- engine name and version, part of cache keys
+    OPTIONS     -- rendering options, part of cache keys
+"""
+import importlib
+
+ENGINE_DEFAULT = 'mistune'
+ENGINES = {
+    'mistune': 'docta.utils.md2',
+    'misaka': 'docta.utils.md',
+}
+
+
+def get_engine(name=None, **custom):
+    """
+    Get Markdown engine module by name. Custom engines may be specified
+    by module name.
+    """
+    name = name or ENGINE_DEFAULT
+    module_name = custom.get(name, ENGINES.get(name, name))
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        raise Exception("Markdown engine '%s' is not available: %s" % (name, e))
+
+
+def available_engines():
+    """
+    Names of registered engines which can be imported.
+    """
+    names = []
+    for name in sorted(ENGINES):
+        try:
+            get_engine(name)
+        except Exception:
+            continue
+        names.append(name)
+    return names
@@ -0,0 +1,137 @@
+"""
+Navigation index for chapters tree: constant time lookups by nav path,
+positions in pre-order, ancestors (breadcrumbs) and prev / next links.
+
+Index is available in templates as `nav`:
+
+    {% for item in nav.breadcrumbs(chapter) %}...{% endfor %}
+    {% set prev, next = nav.prev(chapter), nav.next(chapter) %}
+    {% if nav.in_path(top, chapter) %}class="active"{% endif %}
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+
+class NavIndex(object):
+    """
+    Navigation index built for project tree, see `Project.load()`.
+    Index have to be rebuilt after tree changes.
+    """
+    def __init__(self, tree):
+        self.tree = [root for root in tree if root]
+        self.chapters = {}
+        self.files = {}
+        self.order = []
+        self.positions = {}
+        self.ends = {}
+        self.parents = {}
+        self.build()
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __contains__(self, nav_path):
+        return nav_path in self.chapters
+
+    def __getstate__(self):
+        # positions are keyed by chapters ids, which are not kept
+        # on pickling, so index is rebuilt on unpickling
+        return {'tree': self.tree}
+
+    def __setstate__(self, state):
+        self.__init__(state['tree'])
+
+    def build(self):
+        """
+        Walk tree in pre-order and fill index. For every chapter position
+        and its subtree end position are stored, so ancestry checks are
+        just positions comparison.
+        """
+        self.chapters.clear()
+        self.files.clear()
+        self.positions.clear()
+        self.ends.clear()
+        self.parents.clear()
+        del self.order[:]
+
+        def walk(chapter, ancestors):
+            key = id(chapter)
+            self.positions[key] = len(self.order)
+            self.parents[key] = ancestors
+            self.order.append(chapter)
+            self.chapters.setdefault(chapter.nav_path, chapter)
+            if chapter.file_path:
+                self.files[chapter.file_path] = chapter
+            if chapter.children:
+                child_ancestors = ancestors + (chapter,)
+                for child in chapter.children:
+                    walk(child, child_ancestors)
+            self.ends[key] = len(self.order)
+
+        for root in self.tree:
+            walk(root, ())
+
+    def get(self, nav_path, default=None):
+        """
+        Get chapter by nav path. If several chapters have the same path,
+        the first one in pre-order is returned.
+        """
+        return self.chapters.get(nav_path, default)
+
+    def by_file(self, file_path):
+        """
+        Get chapter by source file path or None.
+        """
+        return self.files.get(file_path)
+
+    def position(self, chapter):
+        """
+        Chapter position in pre-order.
+        """
+        return self.positions[id(chapter)]
+
+    def ancestors(self, chapter):
+        """
+        Chapter ancestors tuple, starting from root.
+        """
+        return self.parents[id(chapter)]
+
+    def breadcrumbs(self, chapter):
+        """
+        Chapter ancestors and chapter itself.
+        """
+        return self.parents[id(chapter)] + (chapter,)
+
+    def prev(self, chapter):
+        """
+        Previous chapter in pre-order or None.
+        """
+        position = self.positions[id(chapter)]
+        if position > 0:
+            return self.order[position - 1]
+
+    def next(self, chapter):
+        """
+        Next chapter in pre-order or None.
+        """
+        position = self.positions[id(chapter)] + 1
+        if position < len(self.order):
+            return self.order[position]
+
+    def is_active(self, node, chapter):
+        """
+        Check if navigation node is current chapter.
+        """
+        return node is chapter
+
+    def in_path(self, node, chapter):
+        """
+        Check if navigation node is current chapter or its ancestor.
+        """
+        node_key = id(node)
+        position = self.positions.get(id(chapter))
+        if position is None or not node_key in self.positions:
+            return False
+        return self.positions[node_key] <= position < self.ends[node_key]
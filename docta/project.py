@@ -4,15 +4,25 @@ Docta projects handler.
 from __future__ import absolute_import, print_function, unicode_literals
 from future.builtins import super
 import os
-import hashlib
 import docta.chapters
 import docta.exceptions
+import docta.navigation
 import docta.render
+import docta.utils.assets
+import docta.utils.cache
+import docta.utils.config
 import docta.utils.fs as fs
 import docta.utils.meta as meta
+import docta.utils.snapshot as snapshot
+import docta.utils.sync
 
 # Defaults
 OUT_FORMAT_DEFAULT = 'html'
+CACHE_PATH_DEFAULT = '_cache'
+MARKDOWN_CACHE_SIZE_DEFAULT = 256  # in megabytes
+HIGHLIGHT_CACHE_SIZE_DEFAULT = 64  # in megabytes
+ASSETS_STATE_FILE = 'assets.json'
+CACHE_ENTRIES = ('jinja', snapshot.SNAPSHOT_FILE, ASSETS_STATE_FILE)  # besides disk caches
 
 
 class Project(object):
@@ -23,34 +33,165 @@ class Project(object):
     def __init__(self, path, config=None):
         self.path = path
         self.config = config or {}
+        self.tree = []
+        self.nav = None
+        self._markdown_cache = None
+        self._highlight_cache = None
+        self._asset_manifest = None
 
     def load(self):
         """
-        Load project structure.
+        Load project structure and build navigation index.
         """
         self.tree = []
+        self._asset_manifest = None
+        tree_snapshot = self.load_snapshot()
 
-        for chapter_config in self.config.get('chapters', []):
-            config = self.config.copy()
-            config.update(chapter_config)
+        for config in self.chapters_configs():
             # print("Chapter config: %s" % config)
 
             nav_path = config.get('base_nav_path', '')
             chapter = docta.chapters.load_tree(self.input_dir(config),
-                                              config, nav_path=nav_path)
+                                              config, nav_path=nav_path,
+                                              snapshot=tree_snapshot)
             self.tree.append(chapter)
             # self.print_tree(self.tree[-1])
 
-    def build(self, formats=None):
+        tree_snapshot.save()
+        self.nav = docta.navigation.NavIndex(self.tree)
+
+    def load_snapshot(self):
+        """
+        Load chapters tree snapshot from cache dir.
+        """
+        cache_dir = self.cache_dir()
+        if cache_dir:
+            path = fs.join(cache_dir, snapshot.SNAPSHOT_FILE)
+            return snapshot.TreeSnapshot.load(path)
+        return snapshot.TreeSnapshot()
+
+    def refresh(self, paths):
+        """
+        Update loaded project for changed source files. Returns changes
+        dict for renderer, see `BaseRenderer.render()`:
+
+            chapters:   chapters of changed sources, their meta is reloaded
+            templates:  changed templates names
+            resources:  changed resources and assets paths
+
+        Assets fingerprints are reset if assets are changed. Project is
+        reloaded completely and None is returned if changes can't be
+        applied in place: project is not loaded yet, chapters are
+        added or removed, or chapters title, sorting or icon are changed.
         """
-        Build project with specified formats.
+        if self.nav is None:
+            self.load()
+            return None
+
+        changes = {'chapters': [], 'templates': [], 'resources': []}
+        templates_dir = fs.real(self.templates_dir())
+        for path in paths:
+            path = fs.real(path)
+            kind = self.file_kind(path)
+            if kind == 'template':
+                name = os.path.relpath(path, templates_dir).replace(fs.sep, '/')
+                changes['templates'].append(name)
+            elif kind == 'resource':
+                changes['resources'].append(path)
+                if self.is_asset(path):
+                    self._asset_manifest = None
+            elif kind == 'chapter':
+                chapter = self.nav.by_file(path)
+                if chapter is None or not fs.isfile(chapter.file_path):
+                    self.load()
+                    return None
+                changes['chapters'].append(chapter)
+
+        for chapter in changes['chapters']:
+            nav_info = (chapter.title, chapter.sorting, chapter.icon,
+                        chapter.meta.get('title'))
+            chapter.load_meta(chapter.file_path)
+            if nav_info != (chapter.title, chapter.sorting, chapter.icon,
+                            chapter.meta.get('title')):
+                self.load()
+                return None
+
+        return changes
+
+    def build(self, formats=None, force=False, jobs=None, changed=None):
         """
-        self.load()
+        Build project with specified formats. Only changed chapters
+        are rendered unless `force` is True. Chapters are rendered with
+        `jobs` processes, see 'jobs' key in output config.
 
+        If `changed` source files are specified, loaded project is updated
+        in place and only affected outputs are updated, see `refresh()`.
+        Returns list of changed outputs paths.
+        """
+        changes = None
+        if changed is None:
+            self.load()
+        else:
+            changes = self.refresh(changed)
+
+        outputs = []
         for out_format in (formats or [OUT_FORMAT_DEFAULT]):
             render_class = docta.render.get_renderer(out_format)
             renderer = render_class(self)
-            renderer.render()
+            outputs.extend(renderer.render(force=force, jobs=jobs, changes=changes))
+        return outputs
+
+    def file_kind(self, path):
+        """
+        Kind of project source file: 'template', 'resource' (resources and
+        assets) or 'chapter' for other files in chapters input dirs. None is
+        returned for files out of project dirs.
+        """
+        path = fs.real(path)
+        if fs.issub(path, fs.real(self.templates_dir())):
+            return 'template'
+        for key in ('assets', 'resources'):
+            if self.config.get(key):
+                if fs.issub(path, fs.real(fs.path_for_dir(self.path, self.config[key]))):
+                    return 'resource'
+        for config in self.chapters_configs():
+            if fs.issub(path, self.input_dir(config)):
+                return 'chapter'
+
+    def chapters_configs(self):
+        """
+        Configs for chapters roots, see 'chapters' key in config.
+        """
+        return [docta.utils.config.ConfigView(self.config, chapter_config)
+                for chapter_config in self.config.get('chapters', [])]
+
+    def watch_dirs(self):
+        """
+        Project source dirs for watching changes: chapters input dirs,
+        templates, resources and assets dirs. Nested dirs are excluded.
+        """
+        dirs = [self.input_dir(config) for config in self.chapters_configs()]
+        dirs.append(self.templates_dir())
+        for key in ('assets', 'resources'):
+            if self.config.get(key):
+                dirs.append(fs.path_for_dir(self.path, self.config[key]))
+        dirs = sorted(set(fs.real(path) for path in dirs if fs.isdir(path)))
+        return [path for path in dirs
+                if not any([path != base and fs.issub(path, base) for base in dirs])]
+
+    def resources_dirs(self, out_format=None):
+        """
+        List of `(kind, source dir, output dir)` for assets and resources,
+        assets are copied to output only if 'assets_path' is configured.
+        """
+        result = []
+        if self.config.get('assets') and self.assets_dir(out_format):
+            result.append(('assets', fs.path_for_dir(self.path, self.config['assets']),
+                           self.assets_dir(out_format)))
+        if self.config.get('resources'):
+            result.append(('resources', fs.path_for_dir(self.path, self.config['resources']),
+                           self.output_dir(out_format)))
+        return result
 
     def input_dir(self, config=None):
         """
@@ -81,39 +222,157 @@ class Project(object):
             if output_rel_path:
                 return fs.path_for_dir(self.path, output_rel_path)
 
+    def cache_dir(self):
+        """
+        Cache directory, `None` if cache is disabled by `cache: false`.
+        """
+        cache = self.config.get('cache', CACHE_PATH_DEFAULT)
+        if isinstance(cache, dict):
+            cache = cache.get('path', CACHE_PATH_DEFAULT)
+        if cache:
+            return fs.path_for_dir(self.path, cache)
+
+    def cache_entries(self):
+        """
+        Paths of existing entries in cache dir besides disk caches, see
+        `CACHE_ENTRIES` and `disk_caches()`. Other files in cache dir are
+        not touched by Docta.
+        """
+        cache_dir = self.cache_dir()
+        if not cache_dir:
+            return []
+        paths = [fs.join(cache_dir, name) for name in CACHE_ENTRIES]
+        return [path for path in paths if fs.isdir(path) or fs.isfile(path)]
+
+    def clear_cache(self):
+        """
+        Clear disk caches and remove other cache entries from cache dir.
+        Cache is not cleared if cache dir is project dir or contains project
+        sources or outputs, as it's probably misconfigured.
+        """
+        cache_dir = self.cache_dir()
+        if not cache_dir:
+            return
+        protected = [self.path, self.templates_dir()]
+        protected.extend([self.input_dir(config) for config in self.chapters_configs()])
+        for key in ('assets', 'resources'):
+            if self.config.get(key):
+                protected.append(fs.path_for_dir(self.path, self.config[key]))
+        protected.extend([self.output_dir(out_format) for out_format in self.config.get('output', {})])
+        for path in protected:
+            if fs.issub(fs.real(path), fs.real(cache_dir)):
+                raise Exception("cache dir contains project files, not cleared: %s" % cache_dir)
+        for cache in self.disk_caches().values():
+            cache.clear()
+        for path in self.cache_entries():
+            fs.rm(path)
+
+    def markdown_cache(self):
+        """
+        Cache for rendered Markdown, `None` if cache is disabled. Size
+        limit is 'markdown_size' key in 'cache' config, in megabytes.
+        """
+        if self._markdown_cache is None:
+            self._markdown_cache = self.disk_cache('markdown', MARKDOWN_CACHE_SIZE_DEFAULT)
+        return self._markdown_cache
+
+    def highlight_cache(self):
+        """
+        Cache for highlighted code, `None` if cache is disabled. Size
+        limit is 'highlight_size' key in 'cache' config, in megabytes.
+        """
+        if self._highlight_cache is None:
+            self._highlight_cache = self.disk_cache('highlight', HIGHLIGHT_CACHE_SIZE_DEFAULT)
+        return self._highlight_cache
+
+    def disk_caches(self):
+        """
+        Disk caches by names, empty dict if cache is disabled.
+        """
+        if not self.cache_dir():
+            return {}
+        return {'markdown': self.markdown_cache(), 'highlight': self.highlight_cache()}
+
+    def disk_cache(self, name, size):
+        """
+        Create disk cache in cache dir, size limit is taken from
+        '<name>_size' key in 'cache' config.
+        """
+        cache_dir = self.cache_dir()
+        if cache_dir:
+            cache = self.config.get('cache')
+            if isinstance(cache, dict):
+                size = cache.get('%s_size' % name, size)
+            return docta.utils.cache.DiskCache(fs.join(cache_dir, name),
+                                               size_limit=size * 1024 * 1024)
+
     def templates_dir(self):
         """
         Jinja templates directory.
         """
         return fs.path_for_dir(self.path, self.config.get('templates', '_templates'))
 
-    def copy_resources(self, out_format=None):
+    def copy_resources(self, out_format=None, previous=None, **options):
         """
-        Copy resources to output directory.
+        Sync resources to output directory, only changed files are copied.
+        Files from `previous` sync result missing in resources are removed.
+        Returns list of synced files, see `docta.utils.sync.sync()`.
         """
         if self.config.get('resources'):
             in_resources = fs.path_for_dir(self.path, self.config['resources'])
             out_resources = self.output_dir(out_format)
-            fs.cp(in_resources, out_resources, overwrite=True)
+            return docta.utils.sync.sync(in_resources, out_resources,
+                                         previous=previous, **options)
 
-    def copy_assets(self, out_format=None):
+    def copy_assets(self, out_format=None, previous=None, **options):
         """
-        Copy assets to output directory.
+        Sync assets to output directory, only changed files are copied.
+        Files from `previous` sync result missing in assets are removed.
+        Returns list of synced files, see `docta.utils.sync.sync()`.
         """
         if self.config.get('assets'):
             in_assets = fs.path_for_dir(self.path, self.config['assets'])
             out_assets = self.assets_dir(out_format)
             if out_assets:
-                fs.cp(in_assets, out_assets, overwrite=True)
+                return docta.utils.sync.sync(in_assets, out_assets,
+                                             previous=previous, **options)
+
+    def assets_source_dir(self):
+        """
+        Assets source directory: 'assets' dir from config or 'assets_url'
+        dir inside resources dir.
+        """
+        if self.config.get('assets'):
+            return fs.path_for_dir(self.path, self.config['assets'])
+        if self.config.get('resources'):
+            assets_url = self.config['server']['assets_url'].strip('/')
+            return fs.path_for_dir(fs.path_for_dir(self.path, self.config['resources']),
+                                   assets_url)
+
+    def is_asset(self, path):
+        """
+        Check if file is in assets source directory.
+        """
+        assets_dir = self.assets_source_dir()
+        return bool(assets_dir) and fs.issub(fs.real(path), fs.real(assets_dir))
+
+    def asset_manifest(self):
+        """
+        Assets fingerprints manifest, created once per project load.
+        """
+        if self._asset_manifest is None:
+            cache_dir = self.cache_dir()
+            state_path = cache_dir and fs.join(cache_dir, ASSETS_STATE_FILE)
+            self._asset_manifest = docta.utils.assets.AssetManifest(
+                self.assets_source_dir() or self.path, state_path=state_path)
+        return self._asset_manifest
 
     def asset_hash(self, rel_path):
         """
         Get asset file checksum.
         """
-        if self.config.get('assets'):
-            assets_dir = fs.path_for_dir(self.path, self.config['assets'])
-            path = os.path.join(assets_dir, rel_path)
-            return hashlib.md5(open(path, 'rb').read()).hexdigest()
+        if self.assets_source_dir():
+            return self.asset_manifest().hash(rel_path)
 
     def print_tree(self, root):
         """
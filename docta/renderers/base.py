@@ -13,15 +13,20 @@ class BaseRenderer(object):
 
     Methods to implement:
 
-        BaseRenderer.render(only=None)
+        BaseRenderer.render(force=False, jobs=None, changes=None)
+            -> list of changed outputs paths
     """
     out_format = None
 
     def __init__(self, project):
         self.project = project
 
-    def render(self):
+    def render(self, force=False, jobs=None, changes=None):
         """
-        Implement `render()` in subclass.
+        Implement `render()` in subclass. Renderer may skip unchanged
+        outputs unless `force` is True and may use `jobs` processes.
+        If `changes` dict is specified, only outputs depending on changed
+        sources may be updated, see `Project.refresh()`.
+        Returns list of changed outputs paths.
         """
         raise Exception(NotImplemented)
@@ -4,14 +4,45 @@ Provides HTML rendered.
 from __future__ import absolute_import, print_function, unicode_literals
 from future.builtins import super
 from functools import partial
+import hashlib
 import jinja2
+import jinja2.meta
+import jinja2.nodes
+import json
+import multiprocessing
+import os
 import random
+import re
+import docta
+import docta.markdown
+import docta.render
 import docta.renderers.base as base
+import docta.utils.compress as compress
 import docta.utils.fs as fs
-import docta.utils.md2 as md
+import docta.utils.highlight as highlight
+import docta.utils.log as log
+import docta.utils.manifest as manifest
 import docta.utils.meta as meta
+import docta.utils.minify as minify
+import docta.utils.sync as sync
 
 HTML_INDEX = ('index', 'html')
+NAVIGATION_TEMPLATE = 'navigation.html'
+NAVIGATION_SCRIPT_TEMPLATE = 'navigation.js'
+NAVIGATION_SCRIPT_PATH = 'js/navigation.js'
+HELPER_TEMPLATES = ('icon.html', NAVIGATION_TEMPLATE)  # rendered by helpers on pages
+NAVIGATION_ATTRS = ('tree', 'parent', 'children')  # navigation tree in templates
+NAVIGATION_PLACEHOLDER = ('<div class="docta-navigation" data-active="%(active)s"></div>'
+                          '<script src="%(script)s"></script>')
+NAVIGATION_INLINE = 'inline'
+NAVIGATION_MANIFEST = 'manifest'
+ACTIVE_DEFAULT = 'class="active"'
+# Config keys not affecting rendered pages, not included to build fingerprint
+FINGERPRINT_SKIP_KEYS = ('cache',)
+FINGERPRINT_SKIP_SERVER_KEYS = ('host', 'port', 'watch', 'page_cache')
+FINGERPRINT_SKIP_OUTPUT_KEYS = ('build_path', 'jobs', 'sync', 'gzip')
+ACTIVE_MARKER = '\x00%s\x01%s\x00'
+ACTIVE_MARKER_RE = re.compile('\x00([^\x01]*)\x01([^\x00]*)\x00')
 
 
 class Renderer(base.BaseRenderer):
@@ -21,67 +52,547 @@ class Renderer(base.BaseRenderer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # Jinja
-        template_loader = jinja2.FileSystemLoader(self.project.templates_dir())
-        self.jinja = jinja2.Environment(loader=template_loader)
+        # Jinja, missing templates are taken from default project,
+        # compiled templates are cached in project cache dir
+        template_loader = jinja2.ChoiceLoader([
+            jinja2.FileSystemLoader(self.project.templates_dir()),
+            jinja2.FileSystemLoader(default_templates_dir()),
+        ])
+        bytecode_cache = None
+        cache_dir = self.project.cache_dir()
+        if cache_dir:
+            jinja_cache_dir = fs.join(cache_dir, 'jinja')
+            fs.mkdirs(jinja_cache_dir)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(jinja_cache_dir)
+        self.jinja = jinja2.Environment(loader=template_loader,
+                                        bytecode_cache=bytecode_cache)
         self.jinja.globals.update(**self.template_globals())
 
-    def render(self):
+        # Navigation fragment cache and navigation script version
+        self.navigation_cache = None
+        self.navigation_script_hash = None
+
+        # Outputs paths changed by build
+        self.changed_outputs = []
+
+        # Bytes saved by pages minification
+        self.bytes_saved = 0
+
+        # Templates sources and dependencies, read once per build
+        self.templates_sources = {}
+        self.templates_deps = {}
+
+        # Context shared by all chapters
+        self.shared_context = None
+
+        # Highlighted code cache
+        highlight.use_cache(self.project.highlight_cache())
+
+    def render(self, force=False, jobs=None, changes=None):
         out_format = self.out_format
         output_dir = self.project.output_dir(out_format)
 
         # Prepare output dir
         fs.mkdirs(output_dir)
+        self.bytes_saved = 0
+
+        # Load build manifest, all pages are rendered on forced build
+        self.load_manifest(force=force)
+
+        # Write navigation manifest, pages refer it instead of inline tree
+        if self.navigation_mode() == NAVIGATION_MANIFEST:
+            self.render_navigation_script()
+        self.fingerprint = self.build_fingerprint()
+
+        # Partial build for changed chapters and templates is possible only
+        # if shared inputs are not changed, otherwise all chapters are checked
+        partial = (changes is not None and not force and
+                   self.manifest.fingerprint == self.fingerprint and
+                   not self.hashed_assets_changed(changes))
+        if partial:
+            selected = set(id(chapter) for chapter in changes['chapters'])
+            templates = set(changes['templates'])
+
+        # Collect changed chapters
+        pages, total_count = [], 0
+        for chapter, home in self.walk_chapters():
+            rel_path = self.get_output_path(chapter)
+            template_name = self.get_template_name(chapter, home=home)
+            if partial and not (id(chapter) in selected or
+                                templates & self.template_deps(template_name)):
+                continue
+
+            # skip chapter if its inputs are not changed since last build
+            key = manifest.text_hash(self.fingerprint, template_name,
+                                     self.template_hash(template_name),
+                                     self.manifest.source_hash(chapter.file_path))
+            out_file_path = fs.join(output_dir, rel_path)
+            if force or not self.manifest.is_fresh(rel_path, key, out_file_path):
+                pages.append((chapter, rel_path, template_name, key))
+            total_count += 1
 
         # Render chapters
+        jobs = self.jobs_count(jobs)
+        if jobs > 1 and len(pages) > 1:
+            written = self.render_parallel(pages, jobs)
+        else:
+            written = 0
+            for chapter, rel_path, template_name, key in pages:
+                written += self.render_chapter(chapter, rel_path, template_name)
+                self.manifest.update(rel_path, key)
+
+        log.message("Rendered pages: %s of %s, changed: %s" %
+                    (len(pages), total_count, written))
+        if self.minify_pages() and pages:
+            log.message("Minified pages, bytes saved: %s" % self.bytes_saved)
+        self.manifest.fingerprint = self.fingerprint
+
+        # Other outputs, resources and assets are not checked on partial build
+        if partial:
+            for path in changes['resources']:
+                self.sync_resource(path)
+            self.compress_outputs(jobs, outputs=self.changed_outputs)
+            self.manifest.keep()
+            self.manifest.save()
+            return self.changed_outputs
+
+        # Remove outputs for removed chapters
+        for rel_path in self.manifest.stale():
+            self.remove_output(rel_path)
+
+        # Evict least recently used rendered Markdown and highlighted code
+        for cache in self.project.disk_caches().values():
+            cache.prune()
+
+        self.sync_static(jobs)
+        self.compress_outputs(jobs)
+        self.manifest.save()
+        return self.changed_outputs
+
+    def render_static(self, jobs=None):
+        """
+        Update static outputs only: navigation script, assets and resources.
+        Pages outputs are kept as is, used for rendering pages on request.
+        Returns list of changed outputs paths.
+        """
+        fs.mkdirs(self.project.output_dir(self.out_format))
+        self.load_manifest()
+        if self.navigation_mode() == NAVIGATION_MANIFEST:
+            self.render_navigation_script()
+        self.manifest.keep()
+        self.sync_static(self.jobs_count(jobs))
+        self.manifest.save()
+        return self.changed_outputs
+
+    def sync_static(self, jobs):
+        """
+        Sync assets and resources and write content-hashed assets copies.
+        """
+        out_format = self.out_format
+        options = self.sync_options(jobs)
+        synced = self.manifest.synced
+        copied_assets, copied_resources = [], []
+        synced['assets'] = self.project.copy_assets(
+            out_format, previous=synced.get('assets'), copied=copied_assets,
+            **options) or []
+        synced['resources'] = self.project.copy_resources(
+            out_format, previous=synced.get('resources'), copied=copied_resources,
+            **options) or []
+        for rel_path in copied_assets:
+            self.changed_outputs.append(fs.join(self.project.assets_dir(out_format), rel_path))
+        for rel_path in copied_resources:
+            self.changed_outputs.append(fs.join(self.project.output_dir(out_format), rel_path))
+
+        # Write content-hashed assets copies and save fingerprints
+        if self.project.assets_source_dir():
+            if self.hashed_assets():
+                self.project.asset_manifest().write_hashed(self.assets_output_dir())
+            self.project.asset_manifest().save()
+
+    def compress_outputs(self, jobs, outputs=None):
+        """
+        Write precompressed `.gz` copies of changed outputs if enabled by
+        'gzip' key in output config, output dir and assets dir are checked.
+        All files are checked unless `outputs` paths are specified. If
+        compression is disabled, previously written `.gz` copies are removed.
+        """
+        level = self.gzip_level()
+        dirs = self.compress_dirs()
+        for out_dir in list(self.manifest.compressed):
+            if not level or not out_dir in dirs:
+                for rel_path in self.manifest.compressed.pop(out_dir):
+                    fs.rm(fs.join(out_dir, rel_path) + compress.GZIP_SUFFIX,
+                          ignore_errors=True)
+        if not level:
+            return
+
+        compressed = []
+        for out_dir in dirs:
+            rel_paths = None
+            if outputs is not None:
+                rel_paths = [os.path.relpath(path, out_dir) for path in outputs
+                             if fs.issub(path, out_dir)]
+            self.manifest.compressed[out_dir], changed = compress.compress_dir(
+                out_dir, previous=self.manifest.compressed.get(out_dir), level=level,
+                jobs=jobs, rel_paths=rel_paths)
+            compressed.extend(changed)
+        if compressed:
+            log.message("Compressed files: %s" % len(compressed))
+
+    def compress_dirs(self):
+        """
+        Dirs with precompressed outputs: output dir and assets dir if it's
+        configured out of output dir.
+        """
+        output_dir = self.project.output_dir(self.out_format)
+        dirs = [output_dir]
+        assets_dir = self.assets_output_dir()
+        if not fs.issub(fs.real(assets_dir), fs.real(output_dir)):
+            dirs.append(assets_dir)
+        return dirs
+
+    def gzip_level(self):
+        """
+        Compression level for precompressed outputs, 'gzip' key in output
+        config: `true` for default level or level from 1 to 9. Returns None
+        if compression is disabled.
+        """
+        config = self.project.config['output'][self.out_format]
+        value = isinstance(config, dict) and config.get('gzip')
+        if value is True:
+            return compress.GZIP_LEVEL_DEFAULT
+        elif value:
+            return min(9, max(1, int(value)))
+
+    def load_manifest(self, force=False):
+        """
+        Load build manifest. If `force` is True, sources checksums are
+        recalculated, previous outputs are still known to remove stale ones.
+        """
+        manifest_path = manifest.path_for(self.project.output_dir(self.out_format))
+        self.manifest = manifest.BuildManifest.load(manifest_path)
+        if force:
+            self.manifest.sources = {}
+
+    def render_parallel(self, pages, jobs):
+        """
+        Render chapters with pool of worker processes. Every worker gets
+        the project tree once on start and then renders chapters by
+        output paths. Returns number of changed output files.
+        """
+        output_dir = self.project.output_dir(self.out_format)
+        keys = dict((rel_path, key) for _, rel_path, _, key in pages)
+        tasks = [(rel_path, template_name) for _, rel_path, template_name, _ in pages]
+        chunk_size = max(1, min(64, len(tasks) // (jobs * 4)))
+        pool = multiprocessing.Pool(jobs, initializer=init_worker,
+                                    initargs=(self.project, self.out_format))
+        written = 0
+        try:
+            caches = self.project.disk_caches()
+            for rel_path, changed, saved, writes in pool.imap_unordered(render_in_worker, tasks,
+                                                                        chunk_size):
+                self.manifest.update(rel_path, keys[rel_path])
+                self.bytes_saved += saved
+                for name, count in writes.items():
+                    caches[name].writes += count
+                if changed:
+                    self.changed_outputs.append(fs.join(output_dir, rel_path))
+                    written += 1
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        return written
+
+    def render_chapter(self, chapter, rel_path, template_name):
+        """
+        Render chapter to output file. Output file is not touched if
+        rendered HTML is not changed, returns True if file is written.
+        """
+        # print("Render: %s" % str(chapter))
+        output_dir = self.project.output_dir(self.out_format)
+        out_file_path = fs.join(output_dir, rel_path)
+        html = self.render_page(chapter, template_name)
+        fs.mkdirs(fs.dirname(out_file_path))
+        written = fs.write(out_file_path, html)
+        if written:
+            self.changed_outputs.append(out_file_path)
+        return written
+
+    def render_page(self, chapter, template_name):
+        """
+        Render chapter page HTML. Content is loaded before rendering
+        and flushed right after. HTML is minified if enabled by 'minify'
+        key in output config.
+        """
+        try:
+            # load content - render - flush content
+            chapter.load_content(cache=self.project.markdown_cache())
+            template = self.get_template(template_name)
+            context = self.template_context(chapter)
+            html = template.render(**context)
+            if self.minify_pages():
+                minified = minify.minify(html)
+                self.bytes_saved += len(html) - len(minified)
+                html = minified
+            return html
+        except Exception as exc:
+            raise Exception("can't render chapter %s: %s" %
+                            (str(chapter), log.exc_to_str(exc)))
+        finally:
+            chapter.flush_content()
+
+    def templates_changed(self):
+        """
+        Forget templates sources and rendered navigation after templates
+        are changed, used when renderer is kept between updates.
+        """
+        self.templates_sources.clear()
+        self.templates_deps.clear()
+        self.navigation_cache = None
+        self.navigation_script_hash = None
+
+    def walk_chapters(self):
+        """
+        Iterate over chapters to render in depth-first order,
+        yields `(chapter, home)` pairs.
+        """
+        def walk(chapter, home=False):
+            if chapter.file_path:
+                yield chapter, home
+            for child in chapter.children:
+                for item in walk(child):
+                    yield item
+
         home = True
         for chapter in self.project.tree:
-            self.render_chapter(chapter, home=home)
+            for item in walk(chapter, home=home):
+                yield item
             home = False  # only the first root chapter is 'home'
 
-        # Copy assets
-        self.project.copy_assets(out_format)
+    def jobs_count(self, jobs=None):
+        """
+        Number of rendering processes, from argument or 'jobs' output
+        config key. Zero means number of CPUs.
+        """
+        if jobs is None:
+            config = self.project.config['output'][self.out_format]
+            jobs = config.get('jobs', 1) if isinstance(config, dict) else 1
+        return int(jobs) or multiprocessing.cpu_count()
 
-        # Copy resources
-        self.project.copy_resources(out_format)
+    def sync_options(self, jobs=None):
+        """
+        Options for assets and resources sync, 'sync' key in output config:
 
-    def render_chapter(self, chapter, home=False):
-        # print("Render: %s" % str(chapter))
-        output_dir = self.project.output_dir(self.out_format)
+            link:      make hardlinks instead of copies where possible
+            checksum:  compare files by content if modification time differs
+        """
+        config = self.project.config['output'][self.out_format]
+        options = isinstance(config, dict) and config.get('sync') or {}
+        return {
+            'link': bool(options.get('link')),
+            'checksum': bool(options.get('checksum')),
+            'jobs': jobs,
+        }
 
-        # dir for index
-        # if chapter.is_index:
-        #     # print(fs.path_for_dir(output_dir, chapter.rel_dir_path))
-        #     fs.mkdirs(fs.path_for_dir(output_dir, chapter.rel_dir_path))
-
-        # load content - render - flush content
-        chapter.load_content()
-
-        if not chapter.content_raw is None:
-            out_file_path = fs.join(output_dir, chapter.rel_dir_path,
-                                    self.get_html_name(chapter))
-            fs.mkdirs(fs.dirname(out_file_path))
-            # print(out_file_path)
-
-            if 'template' in chapter.meta:
-                template = self.get_template(chapter.meta['template'])
-            elif home:
-                template = self.get_template('home.html')
-            elif chapter.is_index:
-                template = self.get_template('index.html')
-            else:
-                template = self.get_template('page.html')
+    def get_output_path(self, chapter):
+        """
+        Get output file path for chapter relative to output dir.
+        """
+        return fs.join(chapter.rel_dir_path, self.get_html_name(chapter))
 
-            with fs.open(out_file_path, 'w') as out_file:
-                context = self.template_context(chapter)
-                html = template.render(**context)
-                out_file.write(html)
-        
-        chapter.flush_content()
+    def get_template_name(self, chapter, home=False):
+        """
+        Get Jinja template name for chapter.
+        """
+        if 'template' in chapter.meta:
+            return chapter.meta['template']
+        elif home:
+            return 'home.html'
+        elif chapter.is_index:
+            return 'index.html'
+        else:
+            return 'page.html'
+
+    def build_fingerprint(self):
+        """
+        Fingerprint for inputs shared by all pages: config affecting
+        rendering, see `rendering_config()`, navigation tree
+        and assets if pages refer them by hash. Any change here makes all
+        pages to be re-rendered. Navigation tree is not taken into account
+        in 'manifest' navigation mode, as pages don't embed the tree, unless
+        templates refer it, see `templates_use_navigation()`. Only script
+        version is taken into account then, as pages refer script by it.
+        Templates are taken into account per page, see `template_hash()`.
+        """
+        config = json.dumps(self.rendering_config(), sort_keys=True, default=str)
 
-        # render children
-        for child in chapter.children:
-            self.render_chapter(child)
+        assets = []
+
+        # pages refer assets by hash, so assets are inputs too
+        if self.assets_by_hash() and self.project.assets_source_dir():
+            assets.append(self.project.asset_manifest().digest())
+
+        navigation = []
+        if (self.navigation_mode() == NAVIGATION_MANIFEST and
+                not self.templates_use_navigation()):
+            navigation.extend((NAVIGATION_MANIFEST, self.navigation_script_version()))
+        else:
+            for chapter in self.project.nav:
+                navigation.extend((chapter.level, chapter.nav_path, chapter.title,
+                                   chapter.icon, chapter.is_index))
+
+        return manifest.text_hash(manifest.MANIFEST_VERSION, config,
+                                  manifest.text_hash(*assets),
+                                  manifest.text_hash(*navigation))
+
+    def rendering_config(self):
+        """
+        Project config without keys not affecting rendered pages: cache,
+        server host and port, watch patterns, build jobs, sync and gzip
+        options and other output formats configs.
+        """
+        def without(config, keys):
+            if isinstance(config, dict):
+                return dict((k, v) for k, v in config.items() if not k in keys)
+            return config
+
+        config = without(self.project.config, FINGERPRINT_SKIP_KEYS)
+        if 'server' in config:
+            config['server'] = without(config['server'], FINGERPRINT_SKIP_SERVER_KEYS)
+        config['output'] = without(self.project.config['output'][self.out_format],
+                                   FINGERPRINT_SKIP_OUTPUT_KEYS)
+        return config
+
+    def assets_by_hash(self):
+        """
+        Check if pages refer assets by hash: hashed assets are enabled or
+        templates use `use_hash` in asset URLs.
+        """
+        if self.hashed_assets():
+            return True
+        for name in self.jinja.list_templates():
+            if 'use_hash' in self.template_source(name)[0]:
+                return True
+        return False
+
+    def hashed_assets_changed(self, changes):
+        """
+        Check if changed resources include assets referred by hash,
+        then all pages and hashed assets copies have to be updated.
+        """
+        return (self.assets_by_hash() and
+                any([self.project.is_asset(path) for path in changes['resources']]))
+
+    def template_source(self, name):
+        """
+        Get `(source, checksum)` for template, `('', None)` if template
+        is missing. Sources are read once per build.
+        """
+        if not name in self.templates_sources:
+            try:
+                source = self.jinja.loader.get_source(self.jinja, name)[0]
+                checksum = hashlib.sha1(source.encode('UTF-8')).hexdigest()
+            except (jinja2.TemplateNotFound, UnicodeDecodeError):
+                source, checksum = '', None
+            self.templates_sources[name] = (source, checksum)
+        return self.templates_sources[name]
+
+    def template_deps(self, name):
+        """
+        Names of template and all templates it depends on: extended, included
+        and imported ones and templates rendered by helpers on every page.
+        If template refers templates by dynamic names, it depends on all
+        templates.
+        """
+        if name in self.templates_deps:
+            return self.templates_deps[name]
+
+        deps, queue = set(), [name] + list(HELPER_TEMPLATES)
+        while queue:
+            dep = queue.pop()
+            if dep in deps:
+                continue
+            deps.add(dep)
+            try:
+                ast = self.jinja.parse(self.template_source(dep)[0])
+            except jinja2.TemplateSyntaxError:
+                continue  # error is reported on rendering
+            for ref in jinja2.meta.find_referenced_templates(ast):
+                if ref is None:
+                    deps.update(self.jinja.list_templates())
+                else:
+                    queue.append(ref)
+
+        self.templates_deps[name] = deps
+        return deps
+
+    def templates_use_navigation(self):
+        """
+        Check if pages templates refer navigation tree besides navigation
+        sidebar: `nav` index, `tree`, `parent` or `children` attributes,
+        i.e. for breadcrumbs or prev / next links.
+        """
+        for name in self.jinja.list_templates(extensions=['html']):
+            if name == NAVIGATION_TEMPLATE:
+                continue
+            try:
+                ast = self.jinja.parse(self.template_source(name)[0])
+            except jinja2.TemplateSyntaxError:
+                continue  # error is reported on rendering
+            if 'nav' in jinja2.meta.find_undeclared_variables(ast):
+                return True
+            for node in ast.find_all(jinja2.nodes.Getattr):
+                if node.attr in NAVIGATION_ATTRS:
+                    return True
+        return False
+
+    def template_hash(self, name):
+        """
+        Checksum for template and all templates it depends on.
+        """
+        return manifest.text_hash(*['%s:%s' % (dep, self.template_source(dep)[1])
+                                    for dep in sorted(self.template_deps(name))])
+
+    def sync_resource(self, path):
+        """
+        Sync single resource or asset file to output, output copy is
+        removed if file is removed from source.
+        """
+        options = self.sync_options()
+        for kind, in_dir, out_dir in self.project.resources_dirs(self.out_format):
+            if fs.issub(path, fs.real(in_dir)):
+                rel_path = os.path.relpath(path, fs.real(in_dir))
+                out_path = fs.join(out_dir, rel_path)
+                synced = set(self.manifest.synced.get(kind, ()))
+                if fs.isfile(path):
+                    if not sync.is_same(path, out_path, checksum=options['checksum']):
+                        sync.copy_file(path, out_path, link=options['link'])
+                        self.changed_outputs.append(out_path)
+                    synced.add(rel_path)
+                else:
+                    fs.rm(out_path, ignore_errors=True)
+                    synced.discard(rel_path)
+                    self.changed_outputs.append(out_path)
+                self.manifest.synced[kind] = sorted(synced)
+                return
+
+    def remove_output(self, rel_path):
+        """
+        Remove output file with its precompressed copy and its directory
+        if it becomes empty.
+        """
+        output_dir = self.project.output_dir(self.out_format)
+        out_file_path = fs.join(output_dir, rel_path)
+        fs.rm(out_file_path, ignore_errors=True)
+        fs.rm(out_file_path + compress.GZIP_SUFFIX, ignore_errors=True)
+        self.changed_outputs.append(out_file_path)
+        out_dir_path = fs.dirname(out_file_path)
+        if out_dir_path != output_dir and fs.isdir(out_dir_path):
+            if not os.listdir(out_dir_path):
+                fs.rm(out_dir_path, ignore_errors=True)
 
     def get_template(self, path):
         """
@@ -134,43 +645,232 @@ class Renderer(base.BaseRenderer):
         icon_template = self.get_template('icon.html')
         icon_context = {'theme': self.theme_config()}
         return {
-            'asset': partial(get_asset_url, project=self.project),
+            'asset': partial(get_asset_url, project=self.project,
+                             hashed=self.hashed_assets()),
             'chapter_url': self.get_chapter_url,
-            'markdown': md.html,
+            'markdown': docta.markdown.get_engine(self.project.config.get('markdown')).html,
             'url': partial(url_full, base_url=base_url),
             'url_external': url_is_external,
             'icon': lambda i: icon_template.render(icon=i, **icon_context) if i else '',
+            'navigation': self.navigation,
             'safe': lambda s: jinja2.Markup(s),
             'random': random.random,
         }
 
+    def navigation(self, chapter):
+        """
+        Navigation fragment for chapter. Fragment is rendered once per build
+        from 'navigation.html' template with markers for `active(node)` calls,
+        then for every chapter only its markers are replaced by active text.
+
+        In 'manifest' navigation mode placeholder is returned, which is
+        filled by navigation script on client side.
+        """
+        if self.navigation_mode() == NAVIGATION_MANIFEST:
+            return NAVIGATION_PLACEHOLDER % {
+                'active': chapter and self.get_chapter_url(chapter) or '',
+                'script': '%s?_=%s' % (get_asset_url(NAVIGATION_SCRIPT_PATH, self.project),
+                                       self.navigation_script_version()),
+            }
+        if self.navigation_cache is None:
+            self.navigation_cache = self.render_navigation()
+        html, offsets = self.navigation_cache
+        active = chapter and offsets.get(chapter.nav_path)
+        if not active:
+            return html
+        bits, last = [], 0
+        for offset, text in active:
+            bits.append(html[last:offset])
+            bits.append(text)
+            last = offset
+        bits.append(html[last:])
+        return ''.join(bits)
+
+    def render_navigation(self):
+        """
+        Render navigation fragment, returns `(html, offsets)` where html is
+        fragment with no active nodes and offsets is dict of `(offset, text)`
+        lists by nav path.
+        """
+        def active(node, text=ACTIVE_DEFAULT):
+            return ACTIVE_MARKER % (node.nav_path, text)
+
+        template = self.get_template(NAVIGATION_TEMPLATE)
+        context = self.template_context(None)
+        context['active'] = active
+        marked = template.render(**context)
+
+        bits, offsets, length, last = [], {}, 0, 0
+        for match in ACTIVE_MARKER_RE.finditer(marked):
+            bit = marked[last:match.start()]
+            bits.append(bit)
+            length += len(bit)
+            offsets.setdefault(match.group(1), []).append((length, match.group(2)))
+            last = match.end()
+        bits.append(marked[last:])
+        return ''.join(bits), offsets
+
+    def render_navigation_script(self):
+        """
+        Render navigation manifest script to assets dir. Script contains
+        compact navigation tree and renders sidebar on client side.
+        """
+        icons = {}
+
+        def node(chapter):
+            if chapter.icon and not chapter.icon in icons:
+                icons[chapter.icon] = self.jinja.globals['icon'](chapter.icon)
+            return [self.get_chapter_url(chapter), chapter.title, chapter.icon or '',
+                    int(chapter.is_index), [node(child) for child in chapter.children]]
+
+        tree = [node(chapter) for chapter in self.project.tree]
+        data = json.dumps({'icons': icons, 'tree': tree}, separators=(',', ':'))
+        template = self.get_template(NAVIGATION_SCRIPT_TEMPLATE)
+        out_file_path = fs.join(self.assets_output_dir(), NAVIGATION_SCRIPT_PATH)
+        fs.mkdirs(fs.dirname(out_file_path))
+        text = template.render(data=data)
+        self.navigation_script_hash = hashlib.sha1(text.encode('UTF-8')).hexdigest()[:8]
+        if fs.write(out_file_path, text):
+            self.changed_outputs.append(out_file_path)
+
+    def navigation_script_version(self):
+        """
+        Navigation script version for URL, derived from script content, so
+        script may be cached by browsers for long. Script written by
+        `render_navigation_script()` is read if it wasn't rendered by
+        renderer itself, i.e. in worker processes.
+        """
+        if self.navigation_script_hash is None:
+            out_file_path = fs.join(self.assets_output_dir(), NAVIGATION_SCRIPT_PATH)
+            if fs.isfile(out_file_path):
+                self.navigation_script_hash = manifest.file_hash(out_file_path)[:8]
+            else:
+                self.navigation_script_hash = ''
+        return self.navigation_script_hash
+
+    def navigation_mode(self):
+        """
+        Navigation output mode, 'navigation' key in output config:
+        'inline' (default) embeds sidebar into every page, 'manifest' writes
+        navigation tree once to assets dir and pages refer it.
+        """
+        config = self.project.config['output'][self.out_format]
+        if isinstance(config, dict):
+            return config.get('navigation', NAVIGATION_INLINE)
+        return NAVIGATION_INLINE
+
+    def hashed_assets(self):
+        """
+        Check if assets are referred by content-hashed file names,
+        'hashed_assets' key in output config.
+        """
+        config = self.project.config['output'][self.out_format]
+        return isinstance(config, dict) and bool(config.get('hashed_assets'))
+
+    def minify_pages(self):
+        """
+        Check if rendered pages are minified, 'minify' key in output config.
+        """
+        config = self.project.config['output'][self.out_format]
+        return isinstance(config, dict) and bool(config.get('minify'))
+
+    def deterministic(self):
+        """
+        Check if rendering is deterministic, 'deterministic' key in output
+        config. In deterministic mode `random()` in templates gives values
+        seeded by chapter path, so the same inputs give the same output.
+        """
+        config = self.project.config['output'][self.out_format]
+        return isinstance(config, dict) and bool(config.get('deterministic'))
+
+    def assets_output_dir(self):
+        """
+        Output directory for assets: 'assets_path' from output config or
+        'assets_url' dir inside output dir.
+        """
+        assets_dir = self.project.assets_dir(self.out_format)
+        if not assets_dir:
+            assets_url = self.project.config['server']['assets_url'].strip('/')
+            assets_dir = fs.join(self.project.output_dir(self.out_format), assets_url)
+        return assets_dir
+
     def template_context(self, chapter):
         """
-        Template context for chapter.
-        """
-        context = {
-            'project': {
-                'title': self.project.config.get('title'),
-                'logo': self.project.config.get('logo'),
-                'copyright': self.project.config.get('copyright'),
-                'extras': self.project.config.get('extras'),
-                'main_menu': self.main_menu_config(),
-                'tree': self.project.tree,
-            },
-            'chapter': chapter,
-            'theme': self.theme_config(),
-        }
+        Template context for chapter. Context part shared by all chapters
+        is calculated once per build.
+        """
+        if self.shared_context is None:
+            self.shared_context = {
+                'project': {
+                    'title': self.project.config.get('title'),
+                    'logo': self.project.config.get('logo'),
+                    'copyright': self.project.config.get('copyright'),
+                    'extras': self.project.config.get('extras'),
+                    'main_menu': self.main_menu_config(),
+                    'tree': self.project.tree,
+                },
+                'nav': self.project.nav,
+                'theme': self.theme_config(),
+            }
+        context = self.shared_context.copy()
+        context['chapter'] = chapter
+        if self.deterministic():
+            seed = int(manifest.text_hash(chapter and chapter.nav_path), 16)
+            context['random'] = random.Random(seed).random
         return context
 
 
+##
+## Worker processes
+##
+
+_worker = {}
+
+
+def init_worker(project, out_format):
+    """
+    Setup renderer in worker process.
+    """
+    renderer = docta.render.get_renderer(out_format)(project)
+    _worker['renderer'] = renderer
+    _worker['chapters'] = dict((renderer.get_output_path(chapter), chapter)
+                               for chapter, _ in renderer.walk_chapters())
+
+
+def render_in_worker(task):
+    """
+    Render chapter by output path in worker process.
+    Returns `(rel_path, changed, bytes saved, disk caches writes)`, caches
+    writes are counted in main process for pruning.
+    """
+    rel_path, template_name = task
+    renderer = _worker['renderer']
+    bytes_saved = renderer.bytes_saved
+    caches = renderer.project.disk_caches()
+    writes = dict((name, cache.writes) for name, cache in caches.items())
+    changed = renderer.render_chapter(_worker['chapters'][rel_path], rel_path, template_name)
+    writes = dict((name, cache.writes - writes[name]) for name, cache in caches.items())
+    return rel_path, changed, renderer.bytes_saved - bytes_saved, writes
+
+
 ##
 ## Template helper functions
 ##
 
 
-def get_asset_url(rel_path, project, use_hash=False):
+def default_templates_dir():
+    """
+    Templates dir of default project, used for missing templates.
+    """
+    return fs.join(fs.dirname(docta.__file__), 'initial', 'default', '_templates')
+
+
+def get_asset_url(rel_path, project, use_hash=False, hashed=False):
     base_url = project.config['server']['base_url'].rstrip('/')
     assets_url = project.config['server']['assets_url'].strip('/')
+    if hashed and project.assets_source_dir():
+        return '/'.join((base_url, assets_url,
+                         project.asset_manifest().hashed_path(rel_path)))
     full_url = '/'.join((base_url, assets_url, rel_path))
     if use_hash:
         hash_str = project.asset_hash(rel_path)
@@ -0,0 +1,144 @@
+"""
+Assets fingerprints manifest. Asset hashes are calculated once per build
+and reused between builds while file modification time and size are not
+changed. Manifest also provides content-hashed file names, i.e.
+'css/docta.3f2a1c09.css' for 'css/docta.css'.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import json
+import os
+import shutil
+import docta.utils.fs as fs
+import docta.utils.manifest as manifest
+import docta.utils.snapshot as snapshot
+
+HASH_LENGTH = 8
+STATE_VERSION = 2
+
+
+def hashed_name(rel_path, checksum):
+    """
+    File name with hash before extension.
+    """
+    dir_name, name = os.path.split(rel_path)
+    if '.' in name:
+        base, ext = name.rsplit('.', 1)
+        name = '%s.%s.%s' % (base, checksum[:HASH_LENGTH], ext)
+    else:
+        name = '%s.%s' % (name, checksum[:HASH_LENGTH])
+    return '/'.join(filter(None, (dir_name.replace(fs.sep, '/'), name)))
+
+
+class AssetManifest(object):
+    """
+    Assets fingerprints for source dir, state is stored in `state_path`
+    file between builds:
+
+        hashes:  {relative path: [mtime, size, checksum]}
+        hashed:  [relative paths of written hashed copies]
+
+    Known hashes are dropped if state version is changed.
+    """
+    def __init__(self, source_dir, state_path=None):
+        self.source_dir = source_dir
+        self.state_path = state_path
+        self.known = {}
+        self.hashes = {}
+        self.hashed = []
+        self.changed = False
+        if state_path:
+            try:
+                with fs.open(state_path, 'r') as in_file:
+                    data = json.load(in_file)
+                if data.get('version') == STATE_VERSION:
+                    self.known = data.get('hashes', {})
+                self.hashed = data.get('hashed', [])
+            except (IOError, OSError, ValueError):
+                pass
+
+    def hash(self, rel_path):
+        """
+        Get asset checksum, None if file is missing. Checksum is
+        calculated at most once per manifest instance.
+        """
+        if rel_path in self.hashes:
+            return self.hashes[rel_path]
+        path = fs.join(self.source_dir, rel_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.hashes[rel_path] = None
+            return None
+        mtime = snapshot.mtime(stat)
+        known = self.known.get(rel_path)
+        if known and known[0] == mtime and known[1] == stat.st_size:
+            checksum = known[2]
+        else:
+            checksum = manifest.file_hash(path)
+            self.known[rel_path] = [mtime, stat.st_size, checksum]
+            self.changed = True
+        self.hashes[rel_path] = checksum
+        return checksum
+
+    def hashed_path(self, rel_path):
+        """
+        Content-hashed relative path for asset, original path is
+        returned if file is missing.
+        """
+        checksum = self.hash(rel_path)
+        if checksum:
+            return hashed_name(rel_path, checksum)
+        return rel_path
+
+    def all_files(self):
+        """
+        Relative paths for all files in source dir.
+        """
+        result = []
+        for dir_path, _, file_names in os.walk(self.source_dir):
+            for name in file_names:
+                path = fs.join(dir_path, name)
+                result.append(os.path.relpath(path, self.source_dir).replace(fs.sep, '/'))
+        return sorted(result)
+
+    def digest(self):
+        """
+        Checksum for all assets.
+        """
+        return manifest.text_hash(*[(rel_path, self.hash(rel_path))
+                                    for rel_path in self.all_files()])
+
+    def write_hashed(self, out_dir):
+        """
+        Write content-hashed copies of all assets to output dir. Copies
+        from previous builds which are not actual anymore are removed.
+        """
+        written = []
+        for rel_path in self.all_files():
+            hashed_path = self.hashed_path(rel_path)
+            out_path = fs.join(out_dir, hashed_path)
+            if not fs.isfile(out_path):
+                fs.mkdirs(fs.dirname(out_path))
+                shutil.copy2(fs.join(self.source_dir, rel_path), out_path)
+            written.append(hashed_path)
+        for hashed_path in set(self.hashed) - set(written):
+            fs.rm(fs.join(out_dir, hashed_path), ignore_errors=True)
+        if written != self.hashed:
+            self.hashed = written
+            self.changed = True
+
+    def save(self):
+        """
+        Save manifest state if changed.
+        """
+        if not self.state_path or not self.changed:
+            return
+        data = {
+            'version': STATE_VERSION,
+            'hashes': dict((k, v) for k, v in self.known.items() if k in self.hashes),
+            'hashed': self.hashed,
+        }
+        fs.mkdirs(fs.dirname(self.state_path))
+        with fs.open(self.state_path, 'w') as out_file:
+            json.dump(data, out_file, sort_keys=True)
+        self.changed = False
@@ -0,0 +1,128 @@
+"""
+Content-addressed on-disk cache. Every entry is stored in separate file
+named by key, so cache may be shared by several processes. Least recently
+used entries are removed when cache exceeds size limit.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import io
+import os
+import docta.utils.fs as fs
+
+
+def dir_stats(path):
+    """
+    Get `(count, size)` for files in directory recursively,
+    `(1, size)` for a file.
+    """
+    if fs.isfile(path):
+        return 1, os.path.getsize(path)
+    count, size = 0, 0
+    for dir_path, _, file_names in os.walk(path):
+        for name in file_names:
+            count += 1
+            size += os.path.getsize(fs.join(dir_path, name))
+    return count, size
+
+
+class DiskCache(object):
+    """
+    Content-addressed cache for text data, entries are stored as
+    `<path>/<key[:2]>/<key>` files. Entry modification time is updated
+    on every hit and used for LRU eviction in `prune()`. Keys are
+    made by `docta.utils.manifest.text_hash()`.
+    """
+    def __init__(self, path, size_limit=None):
+        self.path = path
+        self.size_limit = size_limit
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def entry_path(self, key):
+        return fs.join(self.path, key[:2], key)
+
+    def get(self, key):
+        """
+        Get cached text by key or None.
+        """
+        path = self.entry_path(key)
+        try:
+            with io.open(path, 'rb') as in_file:
+                data = in_file.read().decode('UTF-8')
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def set(self, key, text):
+        """
+        Store text by key. Entry is written atomically, see `fs.write()`,
+        so readers never see partial entries.
+        """
+        path = self.entry_path(key)
+        try:
+            fs.mkdirs(fs.dirname(path))
+            if fs.write(path, text):
+                self.writes += 1
+        except (IOError, OSError):
+            pass
+
+    def entries(self):
+        """
+        List of `(mtime, size, path)` for all entries.
+        """
+        result = []
+        for dir_path, _, file_names in os.walk(self.path):
+            for name in file_names:
+                path = fs.join(dir_path, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                result.append((stat.st_mtime, stat.st_size, path))
+        return result
+
+    def stats(self):
+        """
+        Cache stats dict: entries count, total size, size limit, hits
+        and misses in current process.
+        """
+        count, size = dir_stats(self.path)
+        return {
+            'count': count,
+            'size': size,
+            'size_limit': self.size_limit,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def prune(self):
+        """
+        Remove least recently used entries until cache size fits size
+        limit. Cache is checked only if entries were written since last
+        pruning, see `writes`. Returns number of removed entries.
+        """
+        if not self.size_limit or not self.writes:
+            return 0
+        self.writes = 0
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        removed = 0
+        for _, entry_size, path in sorted(entries):
+            if size <= self.size_limit:
+                break
+            fs.rm(path, ignore_errors=True)
+            size -= entry_size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        fs.rm(self.path, ignore_errors=True)
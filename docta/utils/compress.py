@@ -0,0 +1,116 @@
+"""
+Precompressed outputs: `.gz` siblings are written for compressible files,
+so static servers may send them without compressing on every request.
+Files are compressed only if their content is changed since previous
+build, state is kept as `{relative path: [mtime, size, hash]}` dict.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import gzip
+import io
+import multiprocessing.pool
+import os
+import docta.utils.fs as fs
+import docta.utils.manifest as manifest
+import docta.utils.snapshot as snapshot
+
+GZIP_SUFFIX = '.gz'
+GZIP_LEVEL_DEFAULT = 9
+COMPRESS_PATTERNS = ['*.html', '*.css', '*.js', '*.json', '*.svg', '*.xml',
+                     '*.txt', '*.map', '*.eot', '*.ttf', '*.otf']
+MIN_SIZE = 256  # smaller files are not compressed
+
+
+def is_compressible(path):
+    """
+    Check if file should be compressed by name.
+    """
+    name = fs.basename(path)
+    return any([fs.match(name, mask) for mask in COMPRESS_PATTERNS])
+
+
+def gzip_file(path, level=GZIP_LEVEL_DEFAULT):
+    """
+    Write gzipped copy of file to `<path>.gz`. Header has no file name
+    and time, so the same data always gives the same output. File is
+    written atomically, see `fs.write()`.
+    """
+    with io.open(path, 'rb') as in_file:
+        data = in_file.read()
+    buf = io.BytesIO()
+    gz_file = gzip.GzipFile(filename='', mode='wb', compresslevel=level,
+                            fileobj=buf, mtime=0)
+    try:
+        gz_file.write(data)
+    finally:
+        gz_file.close()
+    fs.write(path + GZIP_SUFFIX, buf.getvalue(), encoding=None)
+
+
+def compress_dir(path, previous=None, level=GZIP_LEVEL_DEFAULT, jobs=1, rel_paths=None):
+    """
+    Write `.gz` siblings for compressible files in directory, returns
+    `(state, compressed)` where `state` is new state dict and `compressed`
+    is list of compressed relative paths. Files are compressed only if
+    their hash is changed since `previous` state or `.gz` file is missing.
+    Stale `.gz` files for removed sources are removed.
+
+    If `rel_paths` list is specified, only these files are checked and
+    state for other files is kept.
+    """
+    previous = previous or {}
+    if rel_paths is None:
+        state, candidates = {}, []
+        for dir_path, _, file_names in os.walk(path):
+            for name in file_names:
+                candidates.append(os.path.relpath(fs.join(dir_path, name), path))
+    else:
+        state, candidates = dict(previous), list(rel_paths)
+    candidates = [rel_path.replace(fs.sep, '/') for rel_path in candidates]
+    if rel_paths is None:
+        removed = set(previous)
+    else:
+        removed = set(candidates) & set(previous)
+
+    tasks = []
+    for rel_path in candidates:
+        file_path = fs.join(path, rel_path)
+        if not is_compressible(rel_path):
+            continue
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        if stat.st_size < MIN_SIZE:
+            continue
+        removed.discard(rel_path)
+        mtime = snapshot.mtime(stat)
+        known = previous.get(rel_path)
+        gz_exists = fs.isfile(file_path + GZIP_SUFFIX)
+        if known and gz_exists and known[0] == mtime and known[1] == stat.st_size:
+            state[rel_path] = known
+            continue
+        checksum = manifest.file_hash(file_path)
+        state[rel_path] = [mtime, stat.st_size, checksum]
+        if not (known and gz_exists and known[2] == checksum):
+            tasks.append(rel_path)
+
+    for rel_path in removed:
+        state.pop(rel_path, None)
+        fs.rm(fs.join(path, rel_path) + GZIP_SUFFIX, ignore_errors=True)
+
+    def compress(rel_path):
+        gzip_file(fs.join(path, rel_path), level=level)
+
+    # zlib releases GIL, so threads are enough
+    if jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.pool.ThreadPool(jobs)
+        try:
+            pool.map(compress, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for rel_path in tasks:
+            compress(rel_path)
+
+    return state, sorted(tasks)
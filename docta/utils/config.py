@@ -0,0 +1,44 @@
+"""
+Config helpers.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+# Python 3.x
+try:
+    from collections.abc import Mapping
+# Python 2.x
+except ImportError:
+    from collections import Mapping
+
+
+class ConfigView(Mapping):
+    """
+    Read-only config view: keys from `overrides` shadow keys from `base`.
+    Nothing is copied, so view may be shared by many objects.
+    """
+    __slots__ = ('base', 'overrides')
+
+    def __init__(self, base, overrides=None):
+        self.base = base
+        self.overrides = overrides or {}
+
+    def __getitem__(self, key):
+        if key in self.overrides:
+            return self.overrides[key]
+        return self.base[key]
+
+    def __contains__(self, key):
+        return key in self.overrides or key in self.base
+
+    def __iter__(self):
+        for key in self.overrides:
+            yield key
+        for key in self.base:
+            if not key in self.overrides:
+                yield key
+
+    def __len__(self):
+        return len(set(self.base).union(self.overrides))
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self))
@@ -6,6 +6,7 @@ import os.path
 import shutil
 import sys
 import fnmatch
+import hashlib
 import docta.exceptions
 
 # os-module shortcuts
@@ -20,6 +21,9 @@ isdir = os.path.isdir
 # matching
 match = fnmatch.fnmatch
 
+# scandir is available since Python 3.5
+scandir = getattr(os, 'scandir', None)
+
 # open file
 if sys.version_info < (3, 0, 0):
     import codecs
@@ -27,6 +31,9 @@ if sys.version_info < (3, 0, 0):
 else:
     _open = open
 
+# atomic rename, os.replace() is available since Python 3.3
+_replace = getattr(os, 'replace', os.rename)
+
 def open(*args, **kwargs):
     """
     Replacement for old open() with new one with encoding param,
@@ -55,6 +62,33 @@ def rm(path, ignore_errors=False):
                 raise e
 
 
+def write(path, text, encoding='UTF-8'):
+    """
+    Write text to file only if its content is changed, so modification
+    time is kept for identical output. Data is written to temporary file
+    and then renamed, so readers never see partial file. Bytes are
+    written as is if `encoding` is None.
+    Returns True if file is written.
+    """
+    data = text.encode(encoding) if encoding else text
+    try:
+        if os.path.getsize(path) == len(data):
+            with _open(path, 'rb') as in_file:
+                if hashlib.sha1(in_file.read()).digest() == hashlib.sha1(data).digest():
+                    return False
+    except (OSError, IOError):
+        pass
+    tmp_path = '%s.%s.tmp' % (path, os.getpid())
+    try:
+        with _open(tmp_path, 'wb') as out_file:
+            out_file.write(data)
+        _replace(tmp_path, path)
+    except:
+        rm(tmp_path, ignore_errors=True)
+        raise
+    return True
+
+
 def cp(src, dst, overwrite=False):
     """Copy files and directories recursively."""
     # overwrite file-to-any and dir-to-file
@@ -73,6 +107,27 @@ def cp(src, dst, overwrite=False):
             cp(join(src, name), join(dst, name), overwrite=overwrite)
 
 
+def scan(path):
+    """Scan directory and get `(files, dirs)` names lists. Entry types
+    are taken from `os.scandir()` cached info where possible, so there's
+    no extra stat calls for every entry. Symlinks are followed."""
+    files, dirs = [], []
+    if scandir:
+        for entry in scandir(path):
+            if entry.is_dir():
+                dirs.append(entry.name)
+            elif entry.is_file():
+                files.append(entry.name)
+    else:
+        for name in os.listdir(path):
+            full_path = join(path, name)
+            if isdir(full_path):
+                dirs.append(name)
+            elif isfile(full_path):
+                files.append(name)
+    return files, dirs
+
+
 def issub(path, base):
     """Cheks if `path` is a sub-path for `base`.
     """
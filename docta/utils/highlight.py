@@ -0,0 +1,88 @@
+"""
+Syntax highlighting on top of Pygments. Lexers and formatters are created
+once per language and options, highlighted code is memoized in memory and
+in optional disk cache, so the same snippets are not highlighted again
+across pages and builds.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import collections
+import threading
+import pygments
+import pygments.formatters
+import pygments.lexers
+import pygments.util
+import docta.utils.manifest as manifest
+
+MEMO_SIZE = 2048  # highlighted snippets kept in memory
+
+_lexers = {}
+_formatters = {}
+_memo = collections.OrderedDict()
+_lock = threading.Lock()
+_disk_cache = None
+
+
+def use_cache(cache):
+    """
+    Use disk cache for highlighted code, `None` to disable.
+    """
+    global _disk_cache
+    _disk_cache = cache
+
+
+def options_key(options):
+    return tuple(sorted(options.items()))
+
+
+def get_lexer(lang, **options):
+    """
+    Get lexer by language name, None if language is unknown.
+    """
+    key = (lang.lower(), options_key(options))
+    if not key in _lexers:
+        try:
+            _lexers[key] = pygments.lexers.get_lexer_by_name(lang, **options)
+        except pygments.util.ClassNotFound:
+            _lexers[key] = None
+    return _lexers[key]
+
+
+def get_formatter(**options):
+    """
+    Get HTML formatter for options.
+    """
+    key = options_key(options)
+    if not key in _formatters:
+        _formatters[key] = pygments.formatters.HtmlFormatter(**options)
+    return _formatters[key]
+
+
+def highlight(code, lang, lexer_options=None, formatter_options=None):
+    """
+    Highlight code as HTML, returns None if language is unknown.
+    """
+    lexer_options = lexer_options or {}
+    formatter_options = formatter_options or {}
+    lexer = get_lexer(lang, **lexer_options)
+    if lexer is None:
+        return None
+
+    key = manifest.text_hash(pygments.__version__, lang.lower(),
+                             options_key(lexer_options),
+                             options_key(formatter_options), code)
+    with _lock:
+        if key in _memo:
+            _memo[key] = _memo.pop(key)  # move to end
+            return _memo[key]
+
+    html = _disk_cache and _disk_cache.get(key)
+    if html is None:
+        html = pygments.highlight(code, lexer, get_formatter(**formatter_options))
+        if _disk_cache:
+            _disk_cache.set(key, html)
+
+    with _lock:
+        _memo[key] = html
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return html
@@ -0,0 +1,155 @@
+"""
+Build manifest for incremental builds. Manifest is stored next to output
+directory and keeps source files hashes, build fingerprint and hashes of
+inputs for every rendered output file.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import hashlib
+import json
+import os
+import docta.utils.fs as fs
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+def path_for(output_dir):
+    """
+    Manifest file path for output directory, i.e. for '/docs/_html'
+    manifest path is '/docs/_html.manifest.json'.
+    """
+    return output_dir.rstrip(fs.sep) + MANIFEST_SUFFIX
+
+
+def file_hash(path):
+    """
+    Get file content checksum.
+    """
+    digest = hashlib.sha1()
+    with fs.open(path, 'rb', encoding=None) as in_file:
+        for chunk in iter(lambda: in_file.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_hash(*bits):
+    """
+    Get checksum for text bits.
+    """
+    digest = hashlib.sha1()
+    for bit in bits:
+        digest.update(('%s' % (bit,)).encode('UTF-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class BuildManifest(object):
+    """
+    Build manifest data:
+
+        sources:  {source path: [mtime, size, hash]}
+        outputs:  {output relative path: inputs key}
+        synced:   {resources kind: [synced relative paths]}
+        compressed:  {dir path: {relative path: [mtime, size, hash]}}
+        fingerprint:  shared inputs fingerprint of last build
+
+    Outputs which were not rendered or confirmed during current
+    build are treated as stale, see `BuildManifest.stale()`.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.sources = {}
+        self.outputs = {}
+        self.synced = {}
+        self.compressed = {}
+        self.fingerprint = None
+        self.seen = set()
+        self.seen_sources = set()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load manifest from file, empty manifest is returned if file
+        is missing or broken.
+        """
+        manifest = cls(path)
+        try:
+            with fs.open(path, 'r') as in_file:
+                data = json.load(in_file)
+        except (IOError, OSError, ValueError):
+            return manifest
+        if data.get('version') == MANIFEST_VERSION:
+            manifest.sources = data.get('sources', {})
+            manifest.outputs = data.get('outputs', {})
+            manifest.synced = data.get('synced', {})
+            manifest.compressed = data.get('compressed', {})
+            if any([isinstance(v, list) for v in manifest.compressed.values()]):
+                output_dir = path[:-len(MANIFEST_SUFFIX)]
+                manifest.compressed = {output_dir: manifest.compressed}  # flat state
+            manifest.fingerprint = data.get('fingerprint')
+        return manifest
+
+    def save(self):
+        """
+        Save manifest to file. Only sources and outputs seen during
+        current build are kept.
+        """
+        data = {
+            'version': MANIFEST_VERSION,
+            'sources': dict((k, v) for k, v in self.sources.items()
+                            if k in self.seen_sources),
+            'outputs': dict((k, v) for k, v in self.outputs.items()
+                            if k in self.seen),
+            'synced': self.synced,
+            'compressed': self.compressed,
+            'fingerprint': self.fingerprint,
+        }
+        fs.mkdirs(fs.dirname(self.path))
+        with fs.open(self.path, 'w') as out_file:
+            json.dump(data, out_file, sort_keys=True)
+
+    def source_hash(self, path):
+        """
+        Get source file checksum. Checksum is recalculated only if file
+        modification time or size is changed since last build.
+        """
+        stat = os.stat(path)
+        mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+        known = self.sources.get(path)
+        self.seen_sources.add(path)
+        if known and known[0] == mtime and known[1] == stat.st_size:
+            return known[2]
+        checksum = file_hash(path)
+        self.sources[path] = [mtime, stat.st_size, checksum]
+        return checksum
+
+    def is_fresh(self, rel_path, key, out_path):
+        """
+        Check if output is rendered from the same inputs and still exists.
+        Fresh output is marked as seen.
+        """
+        if self.outputs.get(rel_path) == key and fs.isfile(out_path):
+            self.seen.add(rel_path)
+            return True
+        return False
+
+    def update(self, rel_path, key):
+        """
+        Store inputs key for rendered output.
+        """
+        self.outputs[rel_path] = key
+        self.seen.add(rel_path)
+
+    def keep(self):
+        """
+        Mark all known sources and outputs as seen, used for partial
+        builds which don't check all outputs.
+        """
+        self.seen.update(self.outputs)
+        self.seen_sources.update(self.sources)
+
+    def stale(self):
+        """
+        Relative paths of outputs not seen during current build.
+        """
+        return sorted(set(self.outputs) - self.seen)
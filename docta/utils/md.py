@@ -2,10 +2,10 @@
 Provides Markdown rendering utils on top of Misaka.
 """
 from __future__ import absolute_import, print_function, unicode_literals
+import threading
 import misaka as m
 import pygments
-import pygments.lexers as lexers
-import pygments.formatters
+import docta.utils.highlight
 
 # Python 3.x
 try:
@@ -16,6 +16,21 @@ except ImportError:
 
 __all__ = ['markdown']
 
+# Default options, engine and options are part of rendered HTML cache keys
+OPTIONS = {
+    'no_intra_emphasis': True,
+    'autolink': True,
+    'wrap': True,
+    'tables': True,
+    'fenced_code': True,
+    'strikethrough': True,
+    'smartypants': True,
+}
+ENGINE_ID = 'misaka-%s/pygments-%s' % (getattr(m, '__version__', ''), pygments.__version__)
+
+# Markdown instances are created once per thread and options
+_local = threading.local()
+
 ALIAS_EXT = {
     'autolink': m.EXT_AUTOLINK,
     'fenced_code': m.EXT_FENCED_CODE,
@@ -75,30 +90,33 @@ class Renderer(m.HtmlRenderer, m.SmartyPants):
     HTML renderer with Pygments highlight support.
     """
     def block_code(self, text, lang):
-        if not lang:
-            return '\n<pre><code>%s</code></pre>\n' % \
-                escape_html(text.strip())
-        lexer = lexers.get_lexer_by_name(lang, stripall=True)
-        formatter = pygments.formatters.HtmlFormatter(cssclass='source')
-        return pygments.highlight(text, lexer, formatter)
+        if lang:
+            html = docta.utils.highlight.highlight(text, lang, {'stripall': True},
+                                                   {'cssclass': 'source'})
+            if html is not None:
+                return html
+        return '\n<pre><code>%s</code></pre>\n' % \
+            escape_html(text.strip())
+
+
+def get_markdown(**options):
+    """
+    Get Markdown instance for options, instances are reused within
+    current thread.
+    """
+    options.update(OPTIONS)
+    key = tuple(sorted(options.items()))
+    instances = getattr(_local, 'instances', None)
+    if instances is None:
+        instances = _local.instances = {}
+    if not key in instances:
+        extensions, render_flags = get_flags(**options)
+        instances[key] = m.Markdown(Renderer(render_flags), extensions=extensions)
+    return instances[key]
 
 
 def html(text, **options):
     """
     Renders Markdown text to valid HTML.
     """
-    # Prepare
-    options.update({
-        'no_intra_emphasis': True,
-        'autolink': True,
-        'wrap': True,
-        'tables': True,
-        'fenced_code': True,
-        'strikethrough': True,
-        'smartypants': True,
-    })
-    extensions, render_flags = get_flags(**options)
-
-    # Render!
-    renderer = m.Markdown(Renderer(render_flags), extensions=extensions)
-    return renderer.render(text)
+    return get_markdown(**options).render(text)
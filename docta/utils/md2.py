@@ -4,26 +4,41 @@ Provides Markdown rendering utils on top of Mistune.
 """
 from __future__ import absolute_import, unicode_literals
 from mistune import escape, Markdown, Renderer, InlineLexer
-from pygments import highlight
-from pygments.lexers import get_lexer_by_name
-from pygments.formatters import HtmlFormatter
+import threading
+import mistune
+import pygments
+import docta.utils.highlight
 
 __all__ = ('html',)
 
+# Engine and options are part of rendered HTML cache keys
+ENGINE_ID = 'mistune-%s/pygments-%s' % (mistune.__version__, pygments.__version__)
+OPTIONS = {'hard_wrap': True}
+LEXER_OPTIONS = {'stripall': True}
+
+# Markdown instance is created once per thread, as it keeps parsing state
+_local = threading.local()
+
 
 class HighlightRenderer(Renderer):
     def block_code(self, code, lang):
-        if not lang:
-            return '\n<pre><code>%s</code></pre>\n' % \
-                escape(code)
-        lexer = get_lexer_by_name(lang, stripall=True)
-        formatter = HtmlFormatter()
-        return highlight(code, lexer, formatter)
+        if lang:
+            html = docta.utils.highlight.highlight(code, lang, LEXER_OPTIONS)
+            if html is not None:
+                return html
+        return '\n<pre><code>%s</code></pre>\n' % \
+            escape(code)
 
 
-def html(text):
-    return markdown(text)
+def get_markdown():
+    """
+    Get Markdown instance for current thread.
+    """
+    markdown = getattr(_local, 'markdown', None)
+    if markdown is None:
+        markdown = _local.markdown = Markdown(HighlightRenderer(**OPTIONS))
+    return markdown
 
 
-renderer = HighlightRenderer(hard_wrap=True)
-markdown = Markdown(renderer)
+def html(text):
+    return get_markdown()(text)
@@ -2,66 +2,65 @@
 Documents metadata tools.
 """
 from __future__ import absolute_import, print_function, unicode_literals
+import io
+import mmap
+import os
 import yaml
 
-DELIMITER = '---'
+DELIMITER_BYTES = b'---'
+MMAP_THRESHOLD = 1024 * 1024  # files larger than 1 MB are memory-mapped
 
 
-def stripped(stream):
+def load(path, **defaults):
     """
-    Read stream to strip YAML header, returns stripped data.
+    Read file YAML header in single pass, returns `(meta, body_offset)`
+    where `body_offset` is position of data next to header.
     """
-    data = []
-    meta_started = False
-    meta_ended = False
-
-    # TODO: cleaner implementation?
-    for next_line in stream:
-        if meta_ended:  # done with meta, collecting data
-            data.append(next_line)
+    meta = Meta(**defaults)
+    with io.open(path, 'rb') as in_file:
+        size = os.fstat(in_file.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            data = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                header, offset = split_header(data)
+            finally:
+                data.close()
         else:
-            if next_line.startswith(DELIMITER):
-                if not meta_started:  # meta start found!
-                    meta_started = True
-                else:  # meta end found!
-                    meta_ended = True
-            else:  # meta not found at all
-                if not meta_started:
-                    data.append(next_line)  # don't lose first line
-                    meta_ended = True
+            header, offset = split_header(in_file.read())
+    if header and header.strip():
+        meta.update(yaml.full_load(header.decode('UTF-8')) or {})
+    return meta, offset
 
-    # TODO: Avoid double memory use? Oh yes, I'm aware
-    #       of premature optimization :)
-    return ''.join(data)
 
+def load_body(path, offset=0):
+    """
+    Read file data next to header, `offset` is returned by `load()`.
+    """
+    with io.open(path, 'rb') as in_file:
+        in_file.seek(offset)
+        data = in_file.read().decode('UTF-8')
+    return data.replace('\r\n', '\n').replace('\r', '\n')
 
-def extract(stream, **defaults):
+
+def split_header(data):
     """
-    Read stream and extract YAML header.
+    Find YAML header in bytes data, returns `(header, offset)` where
+    header is data between delimiter lines or None if there's no header
+    and offset is position of data next to header.
     """
-    meta = Meta(**defaults)
-    meta.load(stream)
-    return meta
+    if data[:len(DELIMITER_BYTES)] != DELIMITER_BYTES:
+        return None, 0  # meta not found at all
+    start = data.find(b'\n') + 1
+    if not start:
+        return b'', len(data)  # single line data
+    end = data.find(b'\n' + DELIMITER_BYTES, start - 1)
+    if end < 0:
+        return data[start:], len(data)  # meta end not found
+    offset = data.find(b'\n', end + 1) + 1
+    return data[start:end + 1], offset or len(data)
 
 
 class Meta(dict):
     """
     Metadata for Markdown files loaded from YAML headers.
     """
-    def load(self, stream):
-        meta_data = []
-        meta_opened = False
-        for next_line in stream:
-            if next_line.startswith(DELIMITER):
-                if meta_opened:
-                    break  # all meta is read, stop reading
-                else:
-                    meta_opened = True  # meta started
-                    continue
-            elif not meta_opened:
-                break  # no meta found
-            else:
-                meta_data.append(next_line)
-
-        if meta_data:
-            self.update(yaml.full_load(''.join(meta_data)))
@@ -0,0 +1,42 @@
+"""
+Simple HTML minifier for rendered pages: comments are removed and
+whitespace runs in text between tags are collapsed to single space or
+line break. Contents of `<pre>`, `<textarea>`, `<script>` and `<style>`
+elements, conditional comments and tags themselves are kept as is.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import re
+
+PROTECTED_RE = re.compile(r'<(pre|textarea|script|style)\b.*?</\1\s*>|<!--\[if.*?<!\[endif\]-->',
+                          re.IGNORECASE | re.DOTALL)
+COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+TAG_RE = re.compile(r'''(<(?:[^>"']|"[^"]*"|'[^']*')*>)''')
+SPACE_RE = re.compile(r'[ \t\n\r\f]+')  # HTML whitespace, but not &nbsp;
+
+
+def collapse(match):
+    return '\n' if '\n' in match.group(0) else ' '
+
+
+def minify_text(html):
+    """
+    Minify HTML fragment without protected elements.
+    """
+    html = COMMENT_RE.sub('', html)
+    parts = TAG_RE.split(html)
+    for i in range(0, len(parts), 2):  # text parts, tags are odd
+        parts[i] = SPACE_RE.sub(collapse, parts[i])
+    return ''.join(parts)
+
+
+def minify(html):
+    """
+    Minify HTML page.
+    """
+    result, position = [], 0
+    for match in PROTECTED_RE.finditer(html):
+        result.append(minify_text(html[position:match.start()]))
+        result.append(match.group(0))
+        position = match.end()
+    result.append(minify_text(html[position:]))
+    return ''.join(result)
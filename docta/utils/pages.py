@@ -0,0 +1,110 @@
+"""
+Pages rendered on request for lazy serving mode. Only chapters tree is
+loaded on start and pages are rendered when requested, rendered pages
+are kept in memory LRU cache. On source files changes only affected
+pages are removed from cache.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import collections
+import threading
+import docta.render
+import docta.utils.fs as fs
+import docta.utils.log as log
+
+PAGE_CACHE_SIZE = 256  # rendered pages kept in memory
+
+
+class PageCache(object):
+    """
+    Renders project pages on request by output relative paths,
+    i.e. 'chapter/install.html' or 'chapter/index.html'.
+    """
+    def __init__(self, project, out_format='html', size=PAGE_CACHE_SIZE):
+        self.project = project
+        self.out_format = out_format
+        self.size = size
+        self.lock = threading.RLock()
+        self.pages = collections.OrderedDict()
+        self.index = {}
+        self.renderer = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, rel_path):
+        """
+        Get rendered page HTML as bytes, None if there's no page
+        for output path.
+        """
+        with self.lock:
+            if rel_path in self.pages:
+                self.pages[rel_path] = self.pages.pop(rel_path)  # move to end
+                self.hits += 1
+                return self.pages[rel_path]
+            if not rel_path in self.index:
+                return None
+            chapter, template_name = self.index[rel_path]
+            data = self.renderer.render_page(chapter, template_name).encode('UTF-8')
+            self.misses += 1
+            self.pages[rel_path] = data
+            while len(self.pages) > self.size:
+                self.pages.popitem(last=False)
+            return data
+
+    def __contains__(self, rel_path):
+        return rel_path in self.index
+
+    def update(self, changed=None):
+        """
+        Update project for changed source files and remove affected pages
+        from cache, see `Project.refresh()`. Project is loaded completely
+        if `changed` is None.
+
+        Returns list of changed outputs paths, None if all pages are changed.
+        """
+        with self.lock:
+            if changed is None:
+                self.project.load()
+                changes = None
+            else:
+                changes = self.project.refresh(changed)
+                if changes and self.renderer.hashed_assets_changed(changes):
+                    changes = None  # all pages refer assets by hash
+
+            if changes is None:
+                render_class = docta.render.get_renderer(self.out_format)
+                self.renderer = render_class(self.project)
+                self.renderer.render_static()
+                self.pages.clear()
+                self.build_index()
+                log.message("Pages available: %s" % len(self.index))
+                return None
+
+            del self.renderer.changed_outputs[:]
+            templates = set(changes['templates'])
+            if templates:
+                self.renderer.templates_changed()
+                self.renderer.render_static()
+            elif changes['resources']:
+                for path in changes['resources']:
+                    self.renderer.sync_resource(path)
+                self.renderer.manifest.save()
+
+            self.build_index()
+            outputs = list(self.renderer.changed_outputs)
+            output_dir = self.project.output_dir(self.out_format)
+            chapters = set(id(chapter) for chapter in changes['chapters'])
+            for rel_path, (chapter, template_name) in self.index.items():
+                if (id(chapter) in chapters or
+                        templates & self.renderer.template_deps(template_name)):
+                    self.pages.pop(rel_path, None)
+                    outputs.append(fs.join(output_dir, rel_path))
+            return outputs
+
+    def build_index(self):
+        """
+        Map output relative paths to chapters and templates names.
+        """
+        self.index.clear()
+        for chapter, home in self.renderer.walk_chapters():
+            rel_path = self.renderer.get_output_path(chapter).replace(fs.sep, '/')
+            self.index[rel_path] = (chapter, self.renderer.get_template_name(chapter, home=home))
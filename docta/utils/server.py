@@ -1,41 +1,439 @@
 """
 Simple HTTP-server for local testing.
+
+Server handles requests in threads and serves files from web root
+directory without changing current working directory. Responses have
+ETag and Last-Modified headers, so browsers revalidate files with
+conditional requests and get 304 for unchanged ones. Connections are
+kept alive with HTTP/1.1, single byte ranges are supported and files
+are sent with `sendfile()` where available. Precompressed `.gz` files
+are sent to clients accepting gzip encoding.
+
+In watch mode server provides live reload: pages get small script
+subscribed to server-sent events, and changed URLs are pushed to
+browsers after every rebuild, so only pages showing them are reloaded.
 """
 from __future__ import absolute_import, print_function, unicode_literals
 import datetime
+import email.utils
+import hashlib
+import io
+import json
 import os
+import posixpath
+import re
+import threading
+import docta.utils.compress as compress
 import docta.utils.log as log
 
 DEFAULT_HOST = '127.0.0.1'
 DEFAULT_PORT = 8000
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+COPY_CHUNK = 64 * 1024
+EVENTS_URL = '/_docta/events'
+LIVE_RELOAD_URL = '/_docta/livereload.js'
+LIVE_RELOAD_TAG = '<script src="%s"></script>' % LIVE_RELOAD_URL
+KEEP_ALIVE_INTERVAL = 15  # seconds between events stream pings
+LIVE_RELOAD_SCRIPT = """(function() {
+  function norm(url) { return url.replace(/index\\.html$/, ''); }
+  var source = new EventSource('%s');
+  source.addEventListener('reload', function(event) {
+    var urls = JSON.parse(event.data), path = norm(location.pathname);
+    for (var i = 0; i < urls.length; i++) {
+      var url = norm(urls[i]);
+      if (url === '*' || url === path || !/(\\/|\\.html)$/.test(url)) {
+        source.close();
+        location.reload();
+        return;
+      }
+    }
+  });
+})();
+""" % EVENTS_URL
 
 # Python 3.x server
 try:
     import http.server
+    import queue
+    import socketserver
+    import urllib.parse as urlparse
     HTTPServer = http.server.HTTPServer
     HTTPRequestHandler = http.server.SimpleHTTPRequestHandler
 # Python 2.x server
 except ImportError:
     import BaseHTTPServer
     import SimpleHTTPServer
+    import SocketServer as socketserver
+    import Queue as queue
+    import urllib as urlparse
     HTTPServer = BaseHTTPServer.HTTPServer
     HTTPRequestHandler = SimpleHTTPServer.SimpleHTTPRequestHandler
 
 
-def run(path, host=None, port=None):
+def run(path, host=None, port=None, pages=None, events=None):
     """
     Start simple HTTP server at specified web root directory and port.
+    Pages rendered on request are served from `pages` cache if specified,
+    see `docta.utils.pages.PageCache`. Live reload is enabled if `events`
+    stream is specified, see `EventStream`.
     """
-    os.chdir(path)
     server_address = (host or DEFAULT_HOST, port or DEFAULT_PORT)
     log.message("Serving directory: %s" % path)
     log.message("Running at http://%s:%s" % server_address)
     log.message("Press ^C to stop server")
-    httpd = HTTPServer(server_address, HTTPRequestHandler)
+    httpd = make_server(path, host=host, port=port, pages=pages, events=events)
 
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
-        httpd.shutdown()
+        httpd.server_close()
         log.message("...\nServer was stopped at %s " %
             datetime.datetime.now().strftime('%d %B %Y - %H:%M:%S'))
+
+
+def make_server(path, host=None, port=None, handler=None, pages=None, events=None):
+    """
+    Create threaded HTTP server for web root directory, port 0 means
+    any free port.
+    """
+    server_address = (host or DEFAULT_HOST, DEFAULT_PORT if port is None else port)
+    return ThreadingHTTPServer(server_address, handler or RequestHandler,
+                               root=path, pages=pages, events=events)
+
+
+class EventStream(object):
+    """
+    Broadcasts events to all subscribed clients, every subscriber
+    gets own queue.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = []
+
+    def subscribe(self):
+        subscriber = queue.Queue()
+        with self.lock:
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def publish(self, event, data):
+        """
+        Send event with JSON data to all subscribers.
+        """
+        message = 'event: %s\ndata: %s\n\n' % (event, json.dumps(data))
+        with self.lock:
+            for subscriber in self.subscribers:
+                subscriber.put(message)
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    HTTP server handling every connection in separate thread.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, root=None, pages=None, events=None):
+        HTTPServer.__init__(self, server_address, handler_class)
+        self.root = os.path.abspath(root or os.getcwd())
+        self.pages = pages
+        self.events = events
+
+
+class RequestHandler(HTTPRequestHandler):
+    """
+    Request handler serving files from server web root with conditional
+    and range requests support.
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body are sent separately
+
+    def translate_path(self, path):
+        """
+        Translate URL path to file path in server web root.
+        """
+        path = path.split('?', 1)[0].split('#', 1)[0]
+        trailing_slash = path.rstrip().endswith('/')
+        path = posixpath.normpath(urlparse.unquote(path))
+        result = self.server.root
+        for word in filter(None, path.split('/')):
+            if os.path.dirname(word) or word in (os.curdir, os.pardir):
+                continue
+            result = os.path.join(result, word)
+        if trailing_slash:
+            result += '/'
+        return result
+
+    def send_head(self):
+        """
+        Send response headers and return file object for body or None.
+        Directories are handled by base class.
+        """
+        self.file_range = None
+        if self.server.events is not None:
+            url_path = self.path.split('?', 1)[0]
+            if url_path == EVENTS_URL:
+                return self.send_events()
+            elif url_path == LIVE_RELOAD_URL:
+                return self.send_data(LIVE_RELOAD_SCRIPT.encode('UTF-8'),
+                                      'application/javascript')
+
+        if self.server.pages is not None:
+            page = self.send_page()
+            if page is not False:
+                return page
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index_path = os.path.join(path, 'index.html')
+            if not self.path.split('?', 1)[0].endswith('/') or not os.path.isfile(index_path):
+                return HTTPRequestHandler.send_head(self)
+            path = index_path
+
+        try:
+            in_file = open(path, 'rb')
+        except (IOError, OSError):
+            self.send_error(404, "File not found")
+            return None
+
+        try:
+            stat = os.fstat(in_file.fileno())
+            etag = '"%x-%x"' % (int(stat.st_mtime * 1000000), stat.st_size)
+            last_modified = self.date_time_string(stat.st_mtime)
+            content_type = self.guess_type(path)
+            live_reload = self.server.events is not None and content_type == 'text/html'
+
+            # Precompressed variant, used if it's not older than file
+            gz_stat, size = None, stat.st_size
+            try:
+                gz_stat = os.stat(path + compress.GZIP_SUFFIX)
+            except OSError:
+                pass
+            if gz_stat and gz_stat.st_mtime < stat.st_mtime:
+                gz_stat = None
+            gzipped = bool(gz_stat and not live_reload and self.accepts_gzip())
+            if gzipped:
+                in_file.close()
+                in_file = open(path + compress.GZIP_SUFFIX, 'rb')
+                etag = '%s-gzip"' % etag[:-1]
+                size = gz_stat.st_size
+
+            if self.not_modified(etag, stat.st_mtime):
+                in_file.close()
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', last_modified)
+                self.send_header('Cache-Control', 'no-cache')
+                if gz_stat:
+                    self.send_header('Vary', 'Accept-Encoding')
+                self.end_headers()
+                return None
+
+            start, length = 0, size
+            byte_range = None if live_reload else self.byte_range(etag, size)
+            if byte_range == 'invalid':
+                in_file.close()
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */%s' % size)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+            elif byte_range:
+                start, length = byte_range
+                self.send_response(206)
+                self.send_header('Content-Range', 'bytes %s-%s/%s' %
+                                 (start, start + length - 1, size))
+            else:
+                self.send_response(200)
+
+            if live_reload:
+                data = self.live_reload(in_file.read())
+                in_file.close()
+                in_file, length = io.BytesIO(data), len(data)
+            else:
+                self.file_range = (start, length)
+
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(length))
+            if gzipped:
+                self.send_header('Content-Encoding', 'gzip')
+            if gz_stat:
+                self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return in_file
+        except:
+            in_file.close()
+            raise
+
+    def accepts_gzip(self):
+        """
+        Check if client accepts gzip content encoding.
+        """
+        for coding in self.headers.get('Accept-Encoding', '').split(','):
+            params = [param.strip() for param in coding.split(';')]
+            if params[0].lower() in ('gzip', 'x-gzip'):
+                return not any([param.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+                                for param in params[1:]])
+        return False
+
+    def send_page(self):
+        """
+        Send page from pages cache, returns file object for body or None.
+        False is returned if there's no page for request path.
+        """
+        url_path = urlparse.unquote(self.path.split('?', 1)[0].split('#', 1)[0])
+        rel_path = posixpath.normpath(url_path).strip('/')
+        if not rel_path or url_path.endswith('/'):
+            rel_path = posixpath.join(rel_path, 'index.html')
+        elif posixpath.join(rel_path, 'index.html') in self.server.pages:
+            self.send_response(301)
+            self.send_header('Location', url_path + '/')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+
+        try:
+            data = self.server.pages.get(rel_path)
+        except Exception as exc:
+            self.send_error(500, log.exc_to_str(exc))
+            return None
+        if data is None:
+            return False
+
+        etag = '"%s"' % hashlib.sha1(data).hexdigest()[:20]
+        if self.not_modified(etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return None
+
+        if self.server.events is not None:
+            data = self.live_reload(data)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        return io.BytesIO(data)
+
+    def send_data(self, data, content_type):
+        """
+        Send in-memory data, returns file object for body.
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        return io.BytesIO(data)
+
+    def send_events(self):
+        """
+        Stream server-sent events to client until connection is closed.
+        Comment lines are sent periodically to detect closed connections.
+        Only headers are sent for HEAD requests.
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        if self.command == 'HEAD':
+            return None
+
+        subscriber = self.server.events.subscribe()
+        try:
+            while True:
+                try:
+                    message = subscriber.get(timeout=KEEP_ALIVE_INTERVAL)
+                except queue.Empty:
+                    message = ': ping\n\n'
+                self.wfile.write(message.encode('UTF-8'))
+                self.wfile.flush()
+        except (IOError, OSError):
+            pass  # client disconnected
+        finally:
+            self.server.events.unsubscribe(subscriber)
+        return None
+
+    def live_reload(self, data):
+        """
+        Insert live reload script tag before closing body tag.
+        """
+        tag = LIVE_RELOAD_TAG.encode('UTF-8')
+        position = data.lower().rfind(b'</body>')
+        if position < 0:
+            return data + tag
+        return data[:position] + tag + data[position:]
+
+    def not_modified(self, etag, mtime=None):
+        """
+        Check conditional request headers, If-None-Match takes precedence
+        over If-Modified-Since.
+        """
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return etag in tags or '*' in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since and mtime is not None:
+            since = email.utils.parsedate_tz(if_modified_since)
+            if since:
+                return int(mtime) <= email.utils.mktime_tz(since)
+        return False
+
+    def byte_range(self, etag, size):
+        """
+        Get `(start, length)` for single range request, None for full
+        response or 'invalid' for unsatisfiable range. Multiple ranges
+        are not supported and full content is sent for them.
+        """
+        header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if not header or (if_range and if_range != etag):
+            return None
+        match = RANGE_RE.match(header.strip())
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1
+        if start >= size or end < start:
+            return 'invalid'
+        return start, end - start + 1
+
+    def copyfile(self, source, outputfile):
+        """
+        Copy file range to output, `socket.sendfile()` is used where
+        available, so data is sent without copying to user space.
+        """
+        if self.file_range is None:
+            return HTTPRequestHandler.copyfile(self, source, outputfile)
+        start, length = self.file_range
+        sendfile = getattr(self.connection, 'sendfile', None)
+        if sendfile:
+            outputfile.flush()
+            sendfile(source, start, length)
+            return
+        source.seek(start)
+        while length > 0:
+            data = source.read(min(COPY_CHUNK, length))
+            if not data:
+                break
+            outputfile.write(data)
+            length -= len(data)
@@ -0,0 +1,101 @@
+"""
+Chapters tree snapshot for fast project loading. Snapshot keeps directories
+listings and files meta keyed by modification times, so only changed
+directories and files are re-scanned on next load.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import os
+import pickle
+import docta.utils.fs as fs
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FILE = 'tree.pickle'
+
+
+def mtime(stat):
+    """
+    Modification time from stat result, nanoseconds where available.
+    """
+    return getattr(stat, 'st_mtime_ns', stat.st_mtime)
+
+
+class TreeSnapshot(object):
+    """
+    Snapshot data:
+
+        dirs:   {dir path: (mtime, file names, dir names)}
+        files:  {file path: (mtime, size, meta, body offset)}
+
+    Only entries used during current load are saved.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.dirs = {}
+        self.files = {}
+        self.seen = set()
+        self.changed = False
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load snapshot from file, empty snapshot is returned if file
+        is missing or broken.
+        """
+        snapshot = cls(path)
+        try:
+            with open(path, 'rb') as in_file:
+                data = pickle.load(in_file)
+        except Exception:
+            return snapshot
+        if data.get('version') == SNAPSHOT_VERSION:
+            snapshot.dirs = data['dirs']
+            snapshot.files = data['files']
+        return snapshot
+
+    def save(self):
+        """
+        Save snapshot to file if anything is changed since loading.
+        """
+        if not self.path:
+            return
+        if not self.changed and len(self.seen) == len(self.dirs) + len(self.files):
+            return
+        data = {
+            'version': SNAPSHOT_VERSION,
+            'dirs': dict((k, v) for k, v in self.dirs.items() if k in self.seen),
+            'files': dict((k, v) for k, v in self.files.items() if k in self.seen),
+        }
+        fs.mkdirs(fs.dirname(self.path))
+        fs.write(self.path, pickle.dumps(data, pickle.HIGHEST_PROTOCOL), encoding=None)
+        self.changed = False
+
+    def scan(self, path):
+        """
+        Get directory `(files, dirs)` names lists, directory is
+        re-scanned only if its modification time is changed.
+        """
+        dir_mtime = mtime(os.stat(path))
+        self.seen.add(path)
+        known = self.dirs.get(path)
+        if known and known[0] == dir_mtime:
+            return known[1], known[2]
+        files, dirs = fs.scan(path)
+        self.dirs[path] = (dir_mtime, files, dirs)
+        self.changed = True
+        return files, dirs
+
+    def meta(self, path, extract_meta):
+        """
+        Get file `(meta, body_offset)`, meta is extracted with
+        `extract_meta(path)` only if file is changed.
+        """
+        stat = os.stat(path)
+        file_mtime = mtime(stat)
+        self.seen.add(path)
+        known = self.files.get(path)
+        if known and known[0] == file_mtime and known[1] == stat.st_size:
+            return known[2], known[3]
+        meta, body_offset = extract_meta(path)
+        self.files[path] = (file_mtime, stat.st_size, meta, body_offset)
+        self.changed = True
+        return meta, body_offset
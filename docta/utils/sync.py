@@ -0,0 +1,121 @@
+"""
+Incremental directories sync: only new and changed files are copied and
+files removed from source since previous sync are removed from target.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import multiprocessing.pool
+import os
+import shutil
+import docta.utils.fs as fs
+import docta.utils.manifest as manifest
+import docta.utils.snapshot as snapshot
+
+COPY_CHUNK = 64 * 1024 * 1024
+
+
+def list_files(path):
+    """
+    Relative paths for all files in directory recursively.
+    """
+    result = []
+    for dir_path, _, file_names in os.walk(path):
+        for name in file_names:
+            result.append(os.path.relpath(fs.join(dir_path, name), path))
+    return result
+
+
+def is_same(src, dst, checksum=False):
+    """
+    Check if target file is up to date: it's the same file (hardlink) or
+    it has the same size and modification time. If `checksum` is True
+    files with different modification times are compared by content.
+    """
+    try:
+        src_stat, dst_stat = os.stat(src), os.stat(dst)
+    except OSError:
+        return False
+    if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+        return True
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if snapshot.mtime(src_stat) == snapshot.mtime(dst_stat):
+        return True
+    if checksum and manifest.file_hash(src) == manifest.file_hash(dst):
+        shutil.copystat(src, dst)
+        return True
+    return False
+
+
+def fast_copy(src, dst):
+    """
+    Copy file data with `os.copy_file_range()` where available, so data
+    is copied in kernel or even shared on CoW file systems. Falls back
+    to `shutil.copyfile()` which uses `sendfile()` on Linux.
+    """
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range:
+        try:
+            with open(src, 'rb') as in_file, open(dst, 'wb') as out_file:
+                while copy_file_range(in_file.fileno(), out_file.fileno(), COPY_CHUNK):
+                    pass
+            return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+
+
+def copy_file(src, dst, link=False):
+    """
+    Copy file with metadata or make hardlink if `link` is True and
+    files are on the same file system.
+    """
+    fs.rm(dst, ignore_errors=True)
+    dst_dir = fs.dirname(dst)
+    if not fs.isdir(dst_dir):
+        fs.mkdirs(dst_dir)
+    if link:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    fast_copy(src, dst)
+    shutil.copystat(src, dst)
+
+
+def sync(src, dst, previous=None, link=False, checksum=False, jobs=1, copied=None):
+    """
+    Sync files from `src` dir to `dst` dir, returns sorted list of synced
+    relative paths. Files listed in `previous` (result of previous sync)
+    which are missing in source are removed from target. Files are
+    copied with `jobs` threads. If `copied` list is specified, relative
+    paths of copied and removed files are appended to it.
+    """
+    rel_paths = sorted(list_files(src)) if fs.isdir(src) else []
+
+    def sync_file(rel_path):
+        src_path, dst_path = fs.join(src, rel_path), fs.join(dst, rel_path)
+        if not is_same(src_path, dst_path, checksum=checksum):
+            copy_file(src_path, dst_path, link=link)
+            if copied is not None:
+                copied.append(rel_path)  # list.append() is thread safe
+            return True
+        return False
+
+    if jobs > 1 and len(rel_paths) > 1:
+        pool = multiprocessing.pool.ThreadPool(jobs)
+        try:
+            pool.map(sync_file, rel_paths)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for rel_path in rel_paths:
+            sync_file(rel_path)
+
+    for rel_path in set(previous or []) - set(rel_paths):
+        fs.rm(fs.join(dst, rel_path), ignore_errors=True)
+        if copied is not None:
+            copied.append(rel_path)
+
+    return rel_paths
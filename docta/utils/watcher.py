@@ -12,84 +12,171 @@ import watchdog.events as events
 import docta.utils.log as log
 import docta.utils.fs as fs
 
+# Python 3.x
+try:
+    import queue
+# Python 2.x
+except ImportError:
+    import Queue as queue
+
 # Defaults
 WATCH_PATTERNS_DEFAULT = ['*.html', '*.md', '*.js', '*.css']
+IGNORE_PATTERNS = ['.*', '*~', '*.tmp']
 REBUILD_DELAY = 0.5  # in seconds
 
 
-def watch(project):
+def watch(project, pages=None, events=None):
     """
     Start watching project input directory to perform automatic builds on changes.
+    If `pages` cache is specified, pages are not built but removed from cache,
+    see `docta.utils.pages.PageCache`. Changed URLs are published to `events`
+    stream for live reload, see `docta.utils.server.EventStream`.
     It doesn't lock thread. Returns `watchdog.observers.Observer` instance.
     """
-    observer = ProjectObserver(project)
+    observer = ProjectObserver(project, pages=pages, events=events)
     observer.start()
     return observer
 
 
 class ProjectObserver(watchdog.observers.Observer):
     """
-    Watches changes in project base directory and automatically
-    rebuilds project.
+    Watches changes in project directories and automatically rebuilds
+    project. Loaded project is kept in memory, so only outputs depending
+    on changed chapters, templates and resources are updated.
+
+    Events are put to queue and builds are performed by single worker
+    thread: events arrived during build are coalesced into one follow-up
+    build. Directories stay scheduled all the time, output and cache dirs
+    events are ignored by handler.
     """
-    def __init__(self, project, *args, **kwargs):
+    def __init__(self, project, pages=None, events=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.project = project
-        self.rebuild_timer = None
-        self.rebuild_going = False
+        self.pages = pages
+        self.events = events
+        self.pending = queue.Queue()
+        self.builder = None
 
     def start(self, *args, **kwargs):
         """
-        Schedule all handlers and start watching thread.
+        Build project, schedule all handlers and start watching
+        and building threads.
         """
-        self.build(initial=True)
+        self.build()
         self.schedule_all()
+        self.builder = threading.Thread(target=self.run_builds)
+        self.builder.daemon = True
+        self.builder.start()
         super().start(*args, **kwargs)
 
-    def schedule_all(self):
+    def stop(self, *args, **kwargs):
         """
-        Schedule all project directories handlers.
+        Stop watching and building threads.
         """
-        log.message("Watching directory: %s" % self.project.input_dir())
-        self.schedule(ProjectPathEventHandler(self),
-                      self.project.input_dir(),
-                      recursive=True)
+        self.pending.put(None)
+        super().stop(*args, **kwargs)
 
-    def needs_rebuild(self):
+    def schedule_all(self):
         """
-        Re(schedule) project rebuild after some delay (500 ms by default). The reason of
-        delay is we want to make sure all buch of recent events have been dispatched.
+        Schedule all project directories handlers: chapters input dirs,
+        templates, resources and assets dirs.
         """
-        if self.rebuild_timer:
-            self.rebuild_timer.cancel()
+        handler = ProjectPathEventHandler(self)
+        for path in self.project.watch_dirs():
+            log.message("Watching directory: %s" % path)
+            self.schedule(handler, path, recursive=True)
 
-        self.rebuild_timer = threading.Timer(REBUILD_DELAY, self.build)
-        self.rebuild_timer.start()
-
-    def build(self, initial=False):
+    def needs_rebuild(self, path=None):
         """
-        Build project and log time spent for operation.
+        Queue project rebuild. If changed file `path` is specified, only outputs
+        depending on this file may be updated, otherwise the whole project is
+        rebuilt, see `Project.refresh()`.
         """
-        if not self.rebuild_going:
-            self.rebuild_going = True
-            t0 = time.time()
-
-            if not initial:
-                self.unschedule_all()
-            
-            self.project.build(['html'])
+        self.pending.put((time.time(), path))
 
-            if not initial:
-                self.schedule_all()
-
-            t1 = time.time()
-            self.rebuild_going = False
-            log.success("  %s" % "rebuild time: %.2fms" % (1000.0 * (t1 - t0)))
+    def next_changes(self):
+        """
+        Wait for queued events and collect them until there are no new events
+        during some delay (500 ms by default), so all bunch of recent events is
+        handled by single build. Returns `(queued_at, changed)` tuple, where
+        `changed` is list of changed files or None for full rebuild,
+        or None if observer is stopped.
+        """
+        item = self.pending.get()
+        if item is None:
+            return None
+        queued_at, changed = item[0], set()
+        while True:
+            path = item[1]
+            if path is None or changed is None:
+                changed = None
+            else:
+                changed.add(path)
+            try:
+                item = self.pending.get(timeout=REBUILD_DELAY)
+            except queue.Empty:
+                break
+            if item is None:
+                return None
+        return queued_at, changed and list(changed)
+
+    def run_builds(self):
+        """
+        Build project on queued changes, runs in building thread.
+        """
+        while True:
+            changes = self.next_changes()
+            if changes is None:
+                break
+            queued_at, changed = changes
+            log.message("  %s" % "queue latency: %.2fms" %
+                        (1000.0 * (time.time() - queued_at)))
+            try:
+                self.build(changed=changed)
+            except Exception as exc:
+                log.error("  %s" % log.exc_to_str(exc))
+
+    def build(self, changed=None):
+        """
+        Build project and log time spent for operation. In lazy mode pages
+        cache is updated instead.
+        """
+        t0 = time.time()
+        if self.pages is not None:
+            outputs = self.pages.update(changed)
+        else:
+            outputs = self.project.build(['html'], changed=changed)
+        t1 = time.time()
+        log.success("  %s" % "rebuild time: %.2fms" % (1000.0 * (t1 - t0)))
+
+        if self.events is not None:
+            urls = self.output_urls(outputs)
+            if urls:
+                self.events.publish('reload', urls)
+
+    def output_urls(self, outputs):
+        """
+        URLs for changed outputs paths, `['*']` if all pages are changed
+        or outputs are out of web root.
+        """
+        if outputs is None:
+            return ['*']
+        output_dir = self.project.output_dir('html')
+        base_url = self.project.config['server'].get('base_url', '/').rstrip('/')
+        urls = set()
+        for path in outputs:
+            rel_path = os.path.relpath(path, output_dir)
+            if rel_path.startswith('..'):
+                return ['*']
+            urls.add('%s/%s' % (base_url, rel_path.replace(fs.sep, '/')))
+        return sorted(urls)
 
 
 class ProjectPathEventHandler(events.FileSystemEventHandler):
     """
-    Rebuilds project on input project data changes.
+    Rebuilds project on input project data changes. Chapters sources are
+    filtered by 'watch' patterns from 'server' config, all templates and
+    resources are watched.
     """
     def __init__(self, observer, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -100,17 +187,48 @@ class ProjectPathEventHandler(events.FileSystemEventHandler):
         self.config = self.project.config.copy()
         self.events_file = (events.FileModifiedEvent, events.FileCreatedEvent, events.FileDeletedEvent)
         self.events_dirs = (events.DirMovedEvent, events.DirDeletedEvent)
-        log.message("Watching patterns: %s" % ' '.join(WATCH_PATTERNS_DEFAULT))
+        self.ignored_dirs = [fs.real(path) for path in (
+            self.project.output_dir('html'),
+            self.project.assets_dir('html'),
+            self.project.cache_dir()) if path]
+        self.patterns = self.config.get('server', {}).get('watch', WATCH_PATTERNS_DEFAULT)
+        log.message("Watching patterns: %s" % ' '.join(self.patterns))
+
+    def is_ignored(self, path):
+        """
+        Check if path is inside output or cache dirs, changes made by
+        builds themselves are ignored.
+        """
+        path = fs.real(path)
+        return any([fs.issub(path, dir_path) for dir_path in self.ignored_dirs])
+
+    def is_watched(self, path):
+        """
+        Check if file changes should trigger rebuild.
+        """
+        name = fs.basename(path)
+        if any([fs.match(name, mask) for mask in IGNORE_PATTERNS]):
+            return False
+        kind = self.project.file_kind(path)
+        if kind == 'chapter':
+            return any([fs.match(name, mask) for mask in self.patterns])
+        return kind is not None
 
     def on_any_event(self, event):
         """
         Filter file/dir events and schedule project rebuild.
         """
+        if self.is_ignored(event.src_path):
+            return
         if isinstance(event, self.events_file):
-            name = fs.basename(event.src_path)
-            if any([fs.match(name, mask) for mask in WATCH_PATTERNS_DEFAULT]):
+            if self.is_watched(event.src_path):
                 log.success("  %s" % "file updated: %s" % event.src_path)
-                self.observer.needs_rebuild()
+                self.observer.needs_rebuild(event.src_path)
+        elif isinstance(event, events.FileMovedEvent):
+            for path in (event.src_path, event.dest_path):
+                if self.is_watched(path) and not self.is_ignored(path):
+                    log.success("  %s" % "file updated: %s" % path)
+                    self.observer.needs_rebuild(path)
         elif isinstance(event, self.events_dirs):
             log.success("  %s" % "directory updated: %s" % event.src_path)
             self.observer.needs_rebuild()
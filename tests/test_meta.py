@@ -0,0 +1,97 @@
+"""
+Tests for YAML headers parsing in `docta.utils.meta`.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import io
+import docta.utils.meta as meta
+
+
+def test_split_header():
+    data = b'---\ntitle: Install\n---\nBody\n'
+    header, offset = meta.split_header(data)
+    assert header == b'title: Install\n'
+    assert data[offset:] == b'Body\n'
+
+
+def test_split_header_missing():
+    assert meta.split_header(b'# Title\n---\nBody\n') == (None, 0)
+    assert meta.split_header(b'') == (None, 0)
+
+
+def test_split_header_unterminated():
+    data = b'---\ntitle: Install\nBody\n'
+    header, offset = meta.split_header(data)
+    assert header == b'title: Install\nBody\n'
+    assert offset == len(data)
+
+
+def test_split_header_single_line():
+    assert meta.split_header(b'---') == (b'', 3)
+
+
+def test_split_header_no_trailing_newline():
+    data = b'---\ntitle: Install\n---'
+    header, offset = meta.split_header(data)
+    assert header == b'title: Install\n'
+    assert offset == len(data)
+
+
+def test_split_header_empty():
+    data = b'---\n---\nBody'
+    header, offset = meta.split_header(data)
+    assert header == b''
+    assert data[offset:] == b'Body'
+
+
+def test_split_header_crlf():
+    data = b'---\r\ntitle: Install\r\nicon: download\r\n---\r\nBody\r\n'
+    header, offset = meta.split_header(data)
+    assert header == b'title: Install\r\nicon: download\r\n'
+    assert data[offset:] == b'Body\r\n'
+
+
+def test_load(tmpdir):
+    path = str(tmpdir.join('page.md'))
+    with io.open(path, 'wb') as out_file:
+        out_file.write(b'---\r\ntitle: Install\r\n---\r\nLine 1\r\nLine 2\r\n')
+    data, offset = meta.load(path, title='Default', icon=None)
+    assert data == {'title': 'Install', 'icon': None}
+    assert meta.load_body(path, offset) == 'Line 1\nLine 2\n'
+
+
+def test_load_no_header(tmpdir):
+    path = str(tmpdir.join('page.md'))
+    with io.open(path, 'wb') as out_file:
+        out_file.write(b'Body\n')
+    data, offset = meta.load(path, title='Default')
+    assert data == {'title': 'Default'}
+    assert meta.load_body(path, offset) == 'Body\n'
+
+
+def test_load_comments_only(tmpdir):
+    path = str(tmpdir.join('page.md'))
+    with io.open(path, 'wb') as out_file:
+        out_file.write(b'---\n# no meta yet\n---\nBody\n')
+    data, offset = meta.load(path, title='Default')
+    assert data == {'title': 'Default'}
+    assert meta.load_body(path, offset) == 'Body\n'
+
+
+def test_load_large_file(tmpdir):
+    path = str(tmpdir.join('page.md'))
+    body = 'Line\n' * (meta.MMAP_THRESHOLD // 5 + 1)
+    with io.open(path, 'wb') as out_file:
+        out_file.write(('---\ntitle: Large\n---\n' + body).encode('UTF-8'))
+    data, offset = meta.load(path)
+    assert data == {'title': 'Large'}
+    assert meta.load_body(path, offset) == body
+
+
+def test_load_large_file_unterminated(tmpdir):
+    path = str(tmpdir.join('page.md'))
+    data = b'---\n' + b'# ' + b'x' * meta.MMAP_THRESHOLD + b'\n'
+    with io.open(path, 'wb') as out_file:
+        out_file.write(data)
+    _, offset = meta.load(path)
+    assert offset == len(data)
+    assert meta.load_body(path, offset) == ''
@@ -0,0 +1,58 @@
+"""
+Tests for HTML minification in `docta.utils.minify`.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import docta.utils.minify as minify
+
+
+def test_whitespace_collapsed():
+    html = '<p>\n    Some   text\t here\n</p>  <p>Next</p>'
+    assert minify.minify(html) == '<p>\nSome text here\n</p> <p>Next</p>'
+
+
+def test_comments_removed():
+    html = '<div><!-- comment --><p>Text</p><!--\nmultiline\n--></div>'
+    assert minify.minify(html) == '<div><p>Text</p></div>'
+
+
+def test_pre_kept():
+    html = '<div>\n  <pre>  code\n\n    indented  </pre>\n</div>'
+    assert minify.minify(html) == '<div>\n<pre>  code\n\n    indented  </pre>\n</div>'
+
+
+def test_highlighted_code_kept():
+    code = ('<div class="highlight"><pre><span class="k">def</span>'
+            ' <span class="nf">f</span><span class="p">():</span>\n'
+            '    <span class="k">return</span>  <span class="mi">1</span>\n</pre></div>')
+    assert minify.minify('<body>\n\n  %s\n</body>' % code) == '<body>\n%s\n</body>' % code
+
+
+def test_pre_case_and_attributes():
+    html = '<PRE class="x">  a  </PRE >  <prefix>  b  </prefix>'
+    assert minify.minify(html) == '<PRE class="x">  a  </PRE > <prefix> b </prefix>'
+
+
+def test_script_style_textarea_kept():
+    html = ('<script>\n  var s = "<!-- x -->";  if (a  <  b) {}\n</script>  '
+            '<style>\n  p  { margin: 0 }\n</style>  '
+            '<textarea>\n  typed   text\n</textarea>')
+    assert minify.minify(html) == ('<script>\n  var s = "<!-- x -->";  if (a  <  b) {}\n</script> '
+                                   '<style>\n  p  { margin: 0 }\n</style> '
+                                   '<textarea>\n  typed   text\n</textarea>')
+
+
+def test_conditional_comments_kept():
+    html = ('<head>  <!--[if lt IE 9]>\n  <script src="html5shiv.js"></script>\n'
+            '<![endif]-->  <!-- plain --></head>')
+    assert minify.minify(html) == ('<head> <!--[if lt IE 9]>\n  <script src="html5shiv.js"></script>\n'
+                                   '<![endif]--> </head>')
+
+
+def test_tags_kept():
+    html = '<a  href="/"   title="a  >  b">Home</a>'
+    assert minify.minify(html) == html
+
+
+def test_nbsp_kept():
+    html = '<p>a\xa0\xa0b &nbsp; c</p>'
+    assert minify.minify(html) == html